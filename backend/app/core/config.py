@@ -1,3 +1,5 @@
+from typing import Dict
+
 from pydantic import BaseSettings
 
 class Settings(BaseSettings):
@@ -6,6 +8,30 @@ class Settings(BaseSettings):
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
     DATABASE_URL: str = "sqlite:///./test.db"
+    # Optional article shards, shard name -> database URL. When set, articles
+    # are stored on the shards by owner and DATABASE_URL keeps everything else.
+    ARTICLE_SHARDS: Dict[str, str] = {}
+    # Seconds until workers notice an owner moved to another shard
+    ARTICLE_SHARD_REFRESH_INTERVAL: float = 1.0
+    # Read cache for single articles and suppliers, per worker process
+    CRUD_CACHE_SIZE: int = 10000
+    CRUD_CACHE_TTL: float = 60.0
+    # Seconds between checks for writes made by other workers, 0 disables
+    CRUD_CACHE_SYNC_INTERVAL: float = 0.0
+    # Responses smaller than this many bytes are sent uncompressed
+    GZIP_MINIMUM_SIZE: int = 1000
+    # Seconds a response stored for an Idempotency-Key is replayed
+    IDEMPOTENCY_KEY_TTL: float = 24 * 60 * 60.0
+    # Seconds a request holds its key before a retry may take it over, and
+    # seconds a retry waits for the request holding its key
+    IDEMPOTENCY_LOCK_TIMEOUT: float = 60.0
+    IDEMPOTENCY_WAIT: float = 10.0
+    # Share of requests profiled without asking, superusers can ask for a
+    # profile with the X-Profile header. Profiles are sampled every
+    # PROFILE_INTERVAL seconds and the newest PROFILE_KEEP are kept.
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL: float = 0.001
+    PROFILE_KEEP: int = 100
 
     class Config:
         case_sensitive = True
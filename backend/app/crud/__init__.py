@@ -1,6 +1,11 @@
 from .user import user
 from .article import article
 from .supplier import supplier
+from .change import change
+from .article_count import article_count
+from .sale import sale
+from .idempotency_key import idempotency_key
+from .request_profile import request_profile
 
 # For a new basic set of CRUD operations you could just do
 
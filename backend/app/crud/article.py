@@ -1,34 +1,283 @@
-from typing import List
+import heapq
+from functools import partial
+from itertools import islice
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import Query, Session, load_only, noload, selectinload
 
-from app.crud.base import CRUDBase
+from app.core.config import settings
+from app.crud.article_count import TOTAL_SCOPE, article_count
+from app.crud.base import GET_MANY_CHUNK_SIZE, CRUDBase
+from app.crud.change import change
+from app.db.cache import EntityCache, cache_sync
+from app.db.transaction import on_commit
 from app.models.article import Article
-from app.schemas.article import ArticleCreate, ArticleUpdate
+from app.models.barcode import Barcode
+from app.schemas.article import ArticleCreate, ArticleInDBBase, ArticleUpdate
+from app.schemas.event import Event
+from app.services.barcode_index import barcode_index
+from app.services.event_hub import event_hub
+from app.services.suggest_index import suggest_index
+
+# Columns and relationships a client may select with `fields=` / `expand=`
+ARTICLE_FIELDS = ("id", "name", "description", "price", "supplier_id", "owner_id")
+ARTICLE_RELATIONS = ("owner", "supplier")
+# Foreign key column each relationship is loaded through
+ARTICLE_RELATION_KEYS = {"owner": "owner_id", "supplier": "supplier_id"}
+# Loaded with every list of full articles, their schema includes the barcodes
+WITH_BARCODES = (selectinload(Article.barcodes),)
 
 
 class CRUDArticle(CRUDBase[Article, ArticleCreate, ArticleUpdate]):
+    def _on_write(
+        self, db: Session, db_obj: Article, *, deleted: bool = False
+    ) -> None:
+        router = db.info.get("shard_router")
+        if router is not None and db_obj.id is None:
+            db_obj.id = router.next_article_id(db)
+        created = inspect(db_obj).pending
+        count_deltas = self._count_deltas(db_obj, created=created, deleted=deleted)
+        db.flush()
+        for scope, scope_id, delta in count_deltas:
+            article_count.apply(db, scope=scope, scope_id=scope_id, delta=delta)
+        db_change = change.record(
+            db,
+            entity="article",
+            entity_id=db_obj.id,
+            owner_id=db_obj.owner_id,
+            deleted=deleted,
+        )
+        if deleted:
+            action = "deleted"
+            on_commit(db, partial(barcode_index.invalidate, db_obj.id))
+            on_commit(db, partial(suggest_index.remove, db_obj.id))
+        else:
+            action = "created" if created else "updated"
+            on_commit(
+                db,
+                partial(
+                    barcode_index.put,
+                    db_obj.id,
+                    [barcode.code for barcode in db_obj.barcodes],
+                    (db_obj.id, db_obj.name, db_obj.price, db_obj.owner_id),
+                ),
+            )
+            on_commit(
+                db,
+                partial(suggest_index.put, db_obj.id, db_obj.owner_id, db_obj.name),
+            )
+        event_hub.queue(
+            db,
+            Event(
+                id=db_change.seq,
+                type=f"article.{action}",
+                owner_id=db_obj.owner_id,
+                supplier_id=db_obj.supplier_id,
+                data=None if deleted else ArticleInDBBase.from_orm(db_obj).dict(),
+            ),
+        )
+
+    def _count_deltas(
+        self, db_obj: Article, *, created: bool, deleted: bool
+    ) -> List[Tuple[str, int, int]]:
+        deltas = []
+        if created or deleted:
+            deltas.append((TOTAL_SCOPE, 0, -1 if deleted else 1))
+        for scope, key in (("owner", "owner_id"), ("supplier", "supplier_id")):
+            if created:
+                old, new = [], [getattr(db_obj, key)]
+            elif deleted:
+                old, new = [getattr(db_obj, key)], []
+            else:
+                history = inspect(db_obj).attrs[key].history
+                old, new = history.deleted or [], history.added or []
+            deltas += [(scope, id, -1) for id in old if id is not None]
+            deltas += [(scope, id, 1) for id in new if id is not None]
+        return deltas
+
+    def _cache_current(self, db: Session, values: Dict[str, Any], token: Any) -> bool:
+        # an article read before its owner moved is keyed to the old shard
+        router = db.info.get("shard_router")
+        return router is None or token == router.shard_for(values["owner_id"])
+
+    def count(
+        self,
+        db: Session,
+        *,
+        owner_id: Optional[int] = None,
+        supplier_id: Optional[int] = None,
+    ) -> int:
+        return article_count.count(db, owner_id=owner_id, supplier_id=supplier_id)
+
     def create_with_owner(
         self, db: Session, *, obj_in: ArticleCreate, owner_id: int
     ) -> Article:
         obj_in_data = jsonable_encoder(obj_in)
+        codes = obj_in_data.pop("barcodes", None)
         db_obj = self.model(**obj_in_data, owner_id=owner_id)
+        if codes:
+            self._set_barcodes(db_obj, codes)
         db.add(db_obj)
+        self._on_write(db, db_obj)
         db.commit()
         db.refresh(db_obj)
         return db_obj
 
-    def get_multi_by_owner(
-        self, db: Session, *, owner_id: int, skip: int = 0, limit: int = 100
+    def update(
+        self,
+        db: Session,
+        *,
+        db_obj: Article,
+        obj_in: Union[ArticleUpdate, Dict[str, Any]]
+    ) -> Article:
+        if isinstance(obj_in, dict):
+            update_data = dict(obj_in)
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+        codes = update_data.pop("barcodes", None)
+        if codes is not None:
+            self._set_barcodes(db_obj, codes)
+        return super().update(db, db_obj=db_obj, obj_in=update_data)
+
+    def _set_barcodes(self, db_obj: Article, codes: Sequence[str]) -> None:
+        # keep the rows of unchanged codes, a delete and insert of the same
+        # code in one flush would violate the unique index
+        existing = {barcode.code: barcode for barcode in db_obj.barcodes}
+        db_obj.barcodes = [
+            existing.get(code) or Barcode(code=code) for code in dict.fromkeys(codes)
+        ]
+
+    def get_by_barcode(self, db: Session, *, code: str) -> Optional[Article]:
+        article_id = (
+            db.query(Barcode.article_id).filter(Barcode.code == code).scalar()
+        )
+        return None if article_id is None else self.get(db, article_id)
+
+    def _query_by_owner(self, db: Session, owner_id: int) -> Query:
+        query = db.query(self.model)
+        router = db.info.get("shard_router")
+        if router is not None:
+            query = query.set_shard(router.shard_for(owner_id))
+        return query.filter(Article.owner_id == owner_id)
+
+    def _get_multi_sharded(
+        self,
+        db: Session,
+        *,
+        options: Sequence = (),
+        filters: Sequence = (),
+        skip: int = 0,
+        limit: int = 100,
     ) -> List[Article]:
-        return (
-            db.query(self.model)
-            .filter(Article.owner_id == owner_id)
-            .offset(skip)
-            .limit(limit)
-            .all()
+        """
+        Page through the articles of all shards matching `filters` ordered by id.
+
+        The ids of the first `skip + limit` rows are fetched from every shard in
+        parallel and merged; only the rows of the requested page are loaded.
+        """
+        router = db.info["shard_router"]
+        statement = (
+            select(Article.id).where(*filters).order_by(Article.id).limit(skip + limit)
         )
+        ids_by_shard = router.fan_out(
+            lambda conn: conn.execute(statement).scalars().all()
+        )
+        merged = heapq.merge(
+            *([(id, shard) for id in ids] for shard, ids in ids_by_shard.items())
+        )
+        page = list(islice(merged, skip, skip + limit))
+        found = {}
+        for shard in {shard for _, shard in page}:
+            ids = [id for id, id_shard in page if id_shard == shard]
+            query = db.query(self.model).options(*options).set_shard(shard)
+            for obj in query.filter(Article.id.in_(ids)):
+                found[obj.id] = obj
+        return [found[id] for id, _ in page if id in found]
+
+    def _supplier_filters(self, supplier_id: Optional[int]) -> List[Any]:
+        return [] if supplier_id is None else [Article.supplier_id == supplier_id]
+
+    def get_multi(
+        self,
+        db: Session,
+        *,
+        supplier_id: Optional[int] = None,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> List[Article]:
+        filters = self._supplier_filters(supplier_id)
+        if db.info.get("shard_router") is not None:
+            return self._get_multi_sharded(
+                db, options=WITH_BARCODES, filters=filters, skip=skip, limit=limit
+            )
+        query = db.query(self.model).options(*WITH_BARCODES).filter(*filters)
+        return query.offset(skip).limit(limit).all()
+
+    def get_multi_by_owner(
+        self,
+        db: Session,
+        *,
+        owner_id: int,
+        supplier_id: Optional[int] = None,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> List[Article]:
+        query = self._query_by_owner(db, owner_id).options(*WITH_BARCODES)
+        query = query.filter(*self._supplier_filters(supplier_id))
+        return query.offset(skip).limit(limit).all()
+
+    def get_many(
+        self, db: Session, ids: Sequence[int], *, chunk_size: int = GET_MANY_CHUNK_SIZE
+    ) -> List[Article]:
+        query = db.query(self.model).options(*WITH_BARCODES)
+        return self._get_many(query, ids, chunk_size=chunk_size)
+
+    def get_many_by_owner(
+        self, db: Session, ids: Sequence[int], *, owner_id: int
+    ) -> List[Article]:
+        query = self._query_by_owner(db, owner_id).options(*WITH_BARCODES)
+        return self._get_many(query, ids)
+
+    def get_multi_sparse(
+        self,
+        db: Session,
+        *,
+        fields: Sequence[str] = ARTICLE_FIELDS,
+        expand: Sequence[str] = (),
+        owner_id: Optional[int] = None,
+        supplier_id: Optional[int] = None,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> List[Article]:
+        """
+        Load articles with only the given columns and relationships.
+
+        Columns not in `fields` are deferred and relationships not in `expand`
+        are never loaded, so callers must only touch what they asked for.
+        """
+        columns = set(fields) | {ARTICLE_RELATION_KEYS[rel] for rel in expand}
+        options = [load_only(*(getattr(Article, column) for column in columns))]
+        for relation in ARTICLE_RELATIONS:
+            if relation in expand:
+                options.append(selectinload(getattr(Article, relation)))
+            else:
+                options.append(noload(getattr(Article, relation)))
+        filters = self._supplier_filters(supplier_id)
+        if owner_id is not None:
+            query = self._query_by_owner(db, owner_id).options(*options)
+        elif db.info.get("shard_router") is not None:
+            return self._get_multi_sharded(
+                db, options=options, filters=filters, skip=skip, limit=limit
+            )
+        else:
+            query = db.query(self.model).options(*options)
+        query = query.filter(*filters).order_by(Article.id)
+        return query.offset(skip).limit(limit).all()
 
 
-article = CRUDArticle(Article)
+article = CRUDArticle(
+    Article, cache=EntityCache(settings.CRUD_CACHE_SIZE, settings.CRUD_CACHE_TTL)
+)
+cache_sync.register("article", article.cache)
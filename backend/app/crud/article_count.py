@@ -0,0 +1,117 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.article import Article
+from app.models.article_count import ArticleCount
+
+# Counter scope -> the article column it counts by
+COUNT_SCOPES = {"owner": Article.owner_id, "supplier": Article.supplier_id}
+# Scope of the single counter of all articles, kept under scope_id 0
+TOTAL_SCOPE = "total"
+
+
+class CRUDArticleCount:
+    def _exact(self, db: Session, filters: Iterable) -> int:
+        # summed, as a sharded session returns one row per shard
+        query = db.query(func.count(Article.id)).filter(*filters)
+        return sum(count for (count,) in query.all())
+
+    def apply(self, db: Session, *, scope: str, scope_id: int, delta: int) -> None:
+        """
+        Add `delta` to a counter inside the caller's transaction, after the
+        article write has been flushed.
+
+        A missing counter is created from an exact count on the next
+        increment; decrements leave it missing, `count` then counts exactly.
+        """
+        updated = (
+            db.query(ArticleCount)
+            .filter(ArticleCount.scope == scope, ArticleCount.scope_id == scope_id)
+            .update(
+                {ArticleCount.count: ArticleCount.count + delta},
+                synchronize_session=False,
+            )
+        )
+        if not updated and delta > 0:
+            if scope == TOTAL_SCOPE:
+                filters = []
+            else:
+                filters = [COUNT_SCOPES[scope] == scope_id]
+            count = self._exact(db, filters)
+            db.add(ArticleCount(scope=scope, scope_id=scope_id, count=count))
+            db.flush()
+
+    def remove(self, db: Session, *, scope: str, scope_id: int) -> None:
+        db.query(ArticleCount).filter(
+            ArticleCount.scope == scope, ArticleCount.scope_id == scope_id
+        ).delete(synchronize_session=False)
+
+    def get(self, db: Session, *, scope: str, scope_id: int) -> Optional[int]:
+        return (
+            db.query(ArticleCount.count)
+            .filter(ArticleCount.scope == scope, ArticleCount.scope_id == scope_id)
+            .scalar()
+        )
+
+    def count(
+        self,
+        db: Session,
+        *,
+        owner_id: Optional[int] = None,
+        supplier_id: Optional[int] = None,
+    ) -> int:
+        """
+        Number of articles matching the filters, from the counters where one
+        covers the filters and by an exact count otherwise.
+        """
+        if owner_id is None or supplier_id is None:
+            if owner_id is None and supplier_id is None:
+                counted = self.get(db, scope=TOTAL_SCOPE, scope_id=0)
+            elif supplier_id is None:
+                counted = self.get(db, scope="owner", scope_id=owner_id)
+            else:
+                counted = self.get(db, scope="supplier", scope_id=supplier_id)
+            if counted is not None:
+                return counted
+        filters = []
+        if owner_id is not None:
+            filters.append(Article.owner_id == owner_id)
+        if supplier_id is not None:
+            filters.append(Article.supplier_id == supplier_id)
+        return self._exact(db, filters)
+
+    def reconcile(
+        self, db: Session
+    ) -> Dict[Tuple[str, int], Tuple[Optional[int], int]]:
+        """
+        Recount every counter and repair the ones that drifted.
+
+        Returns the repaired counters as `(scope, scope_id) -> (old, new)`.
+        """
+        actual: Dict[Tuple[str, int], int] = {(TOTAL_SCOPE, 0): self._exact(db, [])}
+        for scope, column in COUNT_SCOPES.items():
+            rows = (
+                db.query(column, func.count(Article.id))
+                .filter(column.isnot(None))
+                .group_by(column)
+                .all()
+            )
+            for scope_id, count in rows:
+                actual[(scope, scope_id)] = actual.get((scope, scope_id), 0) + count
+        repaired = {}
+        for counter in db.query(ArticleCount).all():
+            key = (counter.scope, counter.scope_id)
+            count = actual.pop(key, 0)
+            if counter.count != count:
+                repaired[key] = (counter.count, count)
+                counter.count = count
+        for (scope, scope_id), count in actual.items():
+            repaired[(scope, scope_id)] = (None, count)
+            db.add(ArticleCount(scope=scope, scope_id=scope_id, count=count))
+        db.commit()
+        return repaired
+
+
+article_count = CRUDArticleCount()
@@ -1,18 +1,28 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from functools import partial
+from typing import Any, Dict, Generic, List, Optional, Sequence, Type, TypeVar, Union
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect
+from sqlalchemy.orm import Query, Session, make_transient_to_detached
 
+from app.db.cache import EntityCache, cache_sync
+from app.db.transaction import on_commit
 from app.models.base import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+# Upper bound for the number of ids bound into a single `IN (...)` clause;
+# SQLite only allows 999 bound parameters per statement on older builds.
+GET_MANY_CHUNK_SIZE = 500
+
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
-    def __init__(self, model: Type[ModelType]):
+    def __init__(
+        self, model: Type[ModelType], cache: Optional[EntityCache] = None
+    ):
         """
         CRUD object with default methods to Create, Read, Update, Delete (CRUD).
 
@@ -20,11 +30,90 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 
         * `model`: A SQLAlchemy model class
         * `schema`: A Pydantic model (schema) class
+        * `cache`: An optional cache for `get`, invalidated by `update`/`remove`
         """
         self.model = model
+        self.cache = cache
+
+    def _on_write(
+        self, db: Session, db_obj: ModelType, *, deleted: bool = False
+    ) -> None:
+        """
+        Called inside every write transaction, right before it is committed.
+        """
 
     def get(self, db: Session, id: Any) -> Optional[ModelType]:
-        return db.query(self.model).filter(self.model.id == id).first()
+        if self.cache is None:
+            return db.query(self.model).filter(self.model.id == id).first()
+        cache_sync.poll(db)
+        cached = self.cache.get(id)
+        if cached is not None and not self._cache_current(db, *cached):
+            self.cache.invalidate(id)
+            cached = None
+        if cached is None:
+            generation = self.cache.generation
+            obj = db.query(self.model).filter(self.model.id == id).first()
+            if obj is not None:
+                self.cache.set(id, self._to_cache(obj), generation)
+            return obj
+        return self._from_cache(db, *cached)
+
+    def _to_cache(self, obj: ModelType) -> tuple:
+        state = inspect(obj)
+        values = {
+            attr.key: getattr(obj, attr.key) for attr in state.mapper.column_attrs
+        }
+        return values, state.identity_token
+
+    def _cache_current(self, db: Session, values: Dict[str, Any], token: Any) -> bool:
+        """
+        Whether a cached row still belongs where it was read from.
+        """
+        return True
+
+    def _from_cache(
+        self, db: Session, values: Dict[str, Any], token: Any
+    ) -> ModelType:
+        """
+        Attach a cached row to the session as if it had been loaded, without SQL.
+        """
+        mapper = inspect(self.model)
+        key = mapper.identity_key_from_primary_key(
+            [values["id"]], identity_token=token
+        )
+        obj = db.identity_map.get(key)
+        if obj is None:
+            obj = self.model(**values)  # type: ignore
+            make_transient_to_detached(obj)
+            inspect(obj).key = key
+            db.add(obj)
+        return obj
+
+    def _invalidate_on_commit(self, db: Session, id: Any) -> None:
+        if self.cache is not None:
+            on_commit(db, partial(self.cache.invalidate, id))
+
+    def get_many(
+        self, db: Session, ids: Sequence[Any], *, chunk_size: int = GET_MANY_CHUNK_SIZE
+    ) -> List[ModelType]:
+        return self._get_many(db.query(self.model), ids, chunk_size=chunk_size)
+
+    def _get_many(
+        self, query: Query, ids: Sequence[Any], *, chunk_size: int = GET_MANY_CHUNK_SIZE
+    ) -> List[ModelType]:
+        """
+        Fetch the rows for `ids` with one `IN` query per chunk of ids.
+
+        Duplicate ids are collapsed and the result follows the order of `ids`;
+        ids without a row are left out.
+        """
+        unique_ids = list(dict.fromkeys(ids))
+        found = {}
+        for start in range(0, len(unique_ids), chunk_size):
+            chunk = unique_ids[start : start + chunk_size]
+            for obj in query.filter(self.model.id.in_(chunk)):
+                found[obj.id] = obj
+        return [found[id] for id in unique_ids if id in found]
 
     def get_multi(
         self, db: Session, *, skip: int = 0, limit: int = 100
@@ -35,6 +124,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         obj_in_data = jsonable_encoder(obj_in)
         db_obj = self.model(**obj_in_data)  # type: ignore
         db.add(db_obj)
+        self._on_write(db, db_obj)
         db.commit()
         db.refresh(db_obj)
         return db_obj
@@ -46,7 +136,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db_obj: ModelType,
         obj_in: Union[UpdateSchemaType, Dict[str, Any]]
     ) -> ModelType:
-        obj_data = jsonable_encoder(db_obj)
+        obj_data = [attr.key for attr in inspect(db_obj).mapper.column_attrs]
         if isinstance(obj_in, dict):
             update_data = obj_in
         else:
@@ -55,12 +145,16 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
         db.add(db_obj)
+        self._on_write(db, db_obj)
+        self._invalidate_on_commit(db, db_obj.id)
         db.commit()
         db.refresh(db_obj)
         return db_obj
 
     def remove(self, db: Session, *, id: int) -> ModelType:
         obj = db.query(self.model).get(id)
+        self._on_write(db, obj, deleted=True)
+        self._invalidate_on_commit(db, id)
         db.delete(obj)
         db.commit()
         return obj
@@ -0,0 +1,83 @@
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.change import Change
+
+
+class CRUDChange:
+    def record(
+        self,
+        db: Session,
+        *,
+        entity: str,
+        entity_id: int,
+        owner_id: Optional[int] = None,
+        deleted: bool = False,
+    ) -> Change:
+        """
+        Bump the change sequence for an entity inside the caller's transaction.
+
+        Only the latest change per entity is kept, so a feed reader pays for
+        the number of changed rows, not the number of writes.
+        """
+        db.query(Change).filter(
+            Change.entity == entity, Change.entity_id == entity_id
+        ).delete(synchronize_session=False)
+        db_obj = Change(
+            entity=entity, entity_id=entity_id, owner_id=owner_id, deleted=deleted
+        )
+        db.add(db_obj)
+        db.flush()
+        return db_obj
+
+    def record_many(
+        self,
+        db: Session,
+        *,
+        entity: str,
+        rows: Sequence[Tuple[int, Optional[int]]],
+        chunk_size: int = 500,
+    ) -> None:
+        """
+        Bulk version of `record` for `(entity_id, owner_id)` rows.
+        """
+        table = Change.__table__
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start : start + chunk_size]
+            db.execute(
+                table.delete().where(
+                    table.c.entity == entity,
+                    table.c.entity_id.in_([entity_id for entity_id, _ in chunk]),
+                )
+            )
+            db.execute(
+                table.insert(),
+                [
+                    {
+                        "entity": entity,
+                        "entity_id": entity_id,
+                        "owner_id": owner_id,
+                        "deleted": False,
+                    }
+                    for entity_id, owner_id in chunk
+                ],
+            )
+
+    def get_since(
+        self,
+        db: Session,
+        *,
+        since: int = 0,
+        owner_id: Optional[int] = None,
+        limit: int = 500,
+    ) -> List[Change]:
+        query = db.query(Change).filter(Change.seq > since)
+        if owner_id is not None:
+            query = query.filter(
+                Change.entity == "article", Change.owner_id == owner_id
+            )
+        return query.order_by(Change.seq).limit(limit).all()
+
+
+change = CRUDChange()
@@ -0,0 +1,130 @@
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.idempotency_key import IdempotencyKey
+
+# Seconds between deletes of expired keys, per worker process
+PURGE_INTERVAL = 60.0
+
+
+class CRUDIdempotencyKey:
+    def __init__(self):
+        self._next_purge = 0.0
+
+    def _get(self, db: Session, user_id: int, key: str) -> Optional[IdempotencyKey]:
+        return (
+            db.query(IdempotencyKey)
+            .populate_existing()
+            .filter(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            .first()
+        )
+
+    def _purge(self, db: Session, now: datetime) -> None:
+        if time.monotonic() < self._next_purge:
+            return
+        self._next_purge = time.monotonic() + PURGE_INTERVAL
+        db.query(IdempotencyKey).filter(IdempotencyKey.expires_at <= now).delete(
+            synchronize_session=False
+        )
+
+    def claim(
+        self, db: Session, *, user_id: int, key: str, fingerprint: str
+    ) -> Tuple[IdempotencyKey, bool]:
+        """
+        Take `key` for a request, in its own committed transaction.
+
+        Returns the key's row and whether the caller now holds it. A key that
+        is held by a request for longer than IDEMPOTENCY_LOCK_TIMEOUT is taken
+        over, its request is assumed to have died. A row that is not claimed
+        either has a stored response, belongs to a different request or is
+        still in flight.
+        """
+        now = datetime.utcnow()
+        lock_timeout = timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+        self._purge(db, now)
+        db_obj = self._get(db, user_id, key)
+        if db_obj is not None and db_obj.expires_at <= now:
+            db.delete(db_obj)
+            db.flush()
+            db_obj = None
+        if db_obj is None:
+            db_obj = IdempotencyKey(
+                user_id=user_id,
+                key=key,
+                fingerprint=fingerprint,
+                locked_until=now + lock_timeout,
+                expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+            )
+            db.add(db_obj)
+            try:
+                db.commit()
+            except IntegrityError:
+                # a concurrent duplicate inserted it first
+                db.rollback()
+                db_obj = self._get(db, user_id, key)
+                db.commit()
+                return db_obj, False
+            return db_obj, True
+        claimed = False
+        if (
+            db_obj.status_code is None
+            and db_obj.fingerprint == fingerprint
+            and db_obj.locked_until <= now
+        ):
+            claimed = bool(
+                db.query(IdempotencyKey)
+                .filter(
+                    IdempotencyKey.user_id == user_id,
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.locked_until == db_obj.locked_until,
+                )
+                .update(
+                    {IdempotencyKey.locked_until: now + lock_timeout},
+                    synchronize_session=False,
+                )
+            )
+        # also ends the read, so that the next poll sees other workers' writes
+        db.commit()
+        return db_obj, claimed
+
+    def complete(
+        self,
+        db: Session,
+        *,
+        user_id: int,
+        key: str,
+        status_code: int,
+        media_type: Optional[str],
+        body: bytes,
+    ) -> None:
+        db.query(IdempotencyKey).filter(
+            IdempotencyKey.user_id == user_id, IdempotencyKey.key == key
+        ).update(
+            {
+                IdempotencyKey.status_code: status_code,
+                IdempotencyKey.media_type: media_type,
+                IdempotencyKey.body: body,
+                IdempotencyKey.locked_until: None,
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+
+    def release(self, db: Session, *, user_id: int, key: str) -> None:
+        """
+        Give up a key without a stored response, so a retry runs again.
+        """
+        db.query(IdempotencyKey).filter(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.status_code.is_(None),
+        ).delete(synchronize_session=False)
+        db.commit()
+
+
+idempotency_key = CRUDIdempotencyKey()
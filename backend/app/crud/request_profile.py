@@ -0,0 +1,35 @@
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.request_profile import RequestProfile
+
+
+class CRUDRequestProfile:
+    def create(self, db: Session, **values) -> RequestProfile:
+        """
+        Store a profile and drop all but the newest PROFILE_KEEP ones.
+        """
+        db_obj = RequestProfile(**values)
+        db.add(db_obj)
+        db.flush()
+        db.query(RequestProfile).filter(
+            RequestProfile.id <= db_obj.id - settings.PROFILE_KEEP
+        ).delete(synchronize_session=False)
+        db.commit()
+        return db_obj
+
+    def get(self, db: Session, id: int) -> Optional[RequestProfile]:
+        return db.query(RequestProfile).get(id)
+
+    def get_multi(self, db: Session, *, limit: int = 100) -> List[RequestProfile]:
+        return (
+            db.query(RequestProfile)
+            .order_by(RequestProfile.id.desc())
+            .limit(limit)
+            .all()
+        )
+
+
+request_profile = CRUDRequestProfile()
@@ -0,0 +1,198 @@
+import os
+from collections import defaultdict
+from functools import partial
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Table, create_engine, func, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.transaction import on_commit
+from app.models.sale import (
+    SalePartition,
+    SalesArticleDay,
+    SalesDay,
+    SalesSupplierDay,
+    sale_lines_table,
+)
+from app.services.suggest_index import suggest_index
+
+# Rollup tables and the sale line column they group by besides day and owner
+ROLLUPS = {
+    "day": (SalesDay, None),
+    "article": (SalesArticleDay, "article_id"),
+    "supplier": (SalesSupplierDay, "supplier_id"),
+}
+
+# Rows copied per statement when archiving a partition
+ARCHIVE_CHUNK_SIZE = 10000
+
+
+class CRUDSale:
+    def _partition(
+        self, db: Session, day: date, *, create: bool = False
+    ) -> Optional[Table]:
+        partition = db.query(SalePartition).get(day)
+        if partition is None:
+            if not create:
+                return None
+            name = f"sale_lines_{day:%Y%m%d}"
+            table = sale_lines_table(name)
+            table.create(bind=db.connection(), checkfirst=True)
+            try:
+                with db.begin_nested():
+                    db.add(SalePartition(day=day, table_name=name))
+                return table
+            except IntegrityError:
+                # the first sale of the day was also recorded concurrently
+                partition = db.query(SalePartition).get(day)
+                if partition is None:
+                    # not visible to this transaction, the table is the same
+                    return table
+        if partition.archived:
+            if create:
+                raise ValueError(f"Sales of {day} are archived")
+            return None
+        return sale_lines_table(partition.table_name)
+
+    def record(
+        self, db: Session, *, sale_id: str, sold_at: datetime, lines: List[dict]
+    ) -> None:
+        """
+        Append the lines of a sale to the partition of its day and add them
+        to the rollups, in the caller's transaction.
+
+        Each line has `owner_id`, `article_id`, `supplier_id`, `quantity`,
+        `unit_price` and `amount`.
+        """
+        day = sold_at.date()
+        table = self._partition(db, day, create=True)
+        db.execute(
+            table.insert(),
+            [dict(line, sale_id=sale_id, sold_at=sold_at) for line in lines],
+        )
+        for model, key in ROLLUPS.values():
+            totals: Dict[tuple, List[float]] = defaultdict(lambda: [0.0, 0])
+            for line in lines:
+                group = (line["owner_id"] or 0, (line[key] or 0) if key else None)
+                totals[group][0] += line["amount"]
+                totals[group][1] += line["quantity"]
+            for (owner_id, key_value), (revenue, quantity) in totals.items():
+                filters = [model.day == day, model.owner_id == owner_id]
+                values = {"day": day, "owner_id": owner_id}
+                if key:
+                    filters.append(getattr(model, key) == key_value)
+                    values[key] = key_value
+                updated = (
+                    db.query(model)
+                    .filter(*filters)
+                    .update(
+                        {
+                            model.revenue: model.revenue + revenue,
+                            model.quantity: model.quantity + quantity,
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                if not updated:
+                    db.add(model(**values, revenue=revenue, quantity=quantity))
+                    db.flush()
+        for line in lines:
+            add_score = partial(
+                suggest_index.add_score, line["article_id"], line["quantity"]
+            )
+            on_commit(db, add_score)
+
+    def report(
+        self,
+        db: Session,
+        *,
+        group_by: str,
+        start: date,
+        end: date,
+        owner_id: Optional[int] = None,
+        today: Optional[date] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Revenue and quantity per day, article or supplier between `start` and
+        `end`, both included.
+
+        Past days are read from the rollups; only the current day is
+        aggregated from its raw sale lines.
+        """
+        today = today or datetime.utcnow().date()
+        model, key = ROLLUPS[group_by]
+        totals: Dict[Any, List[float]] = defaultdict(lambda: [0.0, 0])
+
+        last_closed = min(end, today - timedelta(days=1))
+        if start <= last_closed:
+            key_column = getattr(model, key or "day")
+            query = db.query(
+                key_column, func.sum(model.revenue), func.sum(model.quantity)
+            ).filter(model.day >= start, model.day <= last_closed)
+            if owner_id is not None:
+                query = query.filter(model.owner_id == owner_id)
+            for value, revenue, quantity in query.group_by(key_column):
+                totals[value][0] += revenue
+                totals[value][1] += quantity
+
+        table = self._partition(db, today) if start <= today <= end else None
+        if table is not None:
+            if key is None:
+                key_column = literal(today)
+            else:
+                key_column = func.coalesce(table.c[key], 0)
+            statement = select(
+                key_column, func.sum(table.c.amount), func.sum(table.c.quantity)
+            )
+            if owner_id is not None:
+                statement = statement.where(table.c.owner_id == owner_id)
+            rows = db.execute(statement.group_by(key_column))
+            for value, revenue, quantity in rows:
+                if revenue is not None:
+                    totals[value][0] += revenue
+                    totals[value][1] += quantity
+
+        return [
+            {"key": value, "revenue": round(revenue, 2), "quantity": quantity}
+            for value, (revenue, quantity) in sorted(totals.items())
+        ]
+
+    def archive(self, db: Session, *, day: date, directory: str) -> Optional[str]:
+        """
+        Move the sale lines of a closed day into a SQLite file in `directory`
+        and drop its partition. The rollups are kept, so reports still cover
+        the day. Returns the path of the archive.
+        """
+        if day >= datetime.utcnow().date():
+            raise ValueError("The live partition can't be archived")
+        partition = db.query(SalePartition).get(day)
+        if partition is None or partition.archived:
+            return None
+        table = sale_lines_table(partition.table_name)
+        path = os.path.join(directory, f"{partition.table_name}.db")
+        archive_engine = create_engine(f"sqlite:///{path}")
+        table.create(bind=archive_engine, checkfirst=True)
+        last_id = 0
+        with archive_engine.begin() as conn:
+            while True:
+                rows = db.execute(
+                    select(table)
+                    .where(table.c.id > last_id)
+                    .order_by(table.c.id)
+                    .limit(ARCHIVE_CHUNK_SIZE)
+                ).mappings().all()
+                if not rows:
+                    break
+                conn.execute(table.insert(), [dict(row) for row in rows])
+                last_id = rows[-1]["id"]
+        archive_engine.dispose()
+        table.drop(bind=db.connection())
+        partition.archived = True
+        partition.archive_path = path
+        db.commit()
+        return path
+
+
+sale = CRUDSale()
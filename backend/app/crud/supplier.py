@@ -1,10 +1,76 @@
+from functools import partial
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.article import article as crud_article
+from app.crud.article_count import TOTAL_SCOPE, article_count
 from app.crud.base import CRUDBase
+from app.crud.change import change
+from app.db.cache import EntityCache, cache_sync
+from app.db.transaction import on_commit
 from app.models.supplier import Supplier
+from app.schemas.event import Event
+from app.schemas.supplier import Supplier as SupplierSchema
 from app.schemas.supplier import SupplierCreate, SupplierUpdate
+from app.services.barcode_index import barcode_index
+from app.services.event_hub import event_hub
+from app.services.suggest_index import suggest_index
 
 
 class CRUDSupplier(CRUDBase[Supplier, SupplierCreate, SupplierUpdate]):
-    pass
+    def _on_write(
+        self, db: Session, db_obj: Supplier, *, deleted: bool = False
+    ) -> None:
+        created = inspect(db_obj).pending
+        db.flush()
+        db_change = change.record(
+            db, entity="supplier", entity_id=db_obj.id, deleted=deleted
+        )
+        if deleted:
+            action = "deleted"
+        else:
+            action = "created" if created else "updated"
+        event_hub.queue(
+            db,
+            Event(
+                id=db_change.seq,
+                type=f"supplier.{action}",
+                supplier_id=db_obj.id,
+                data=None if deleted else SupplierSchema.from_orm(db_obj).dict(),
+            ),
+        )
+        if deleted:
+            # the articles go with the supplier (delete-orphan cascade)
+            article_count.remove(db, scope="supplier", scope_id=db_obj.id)
+            for article in db_obj.articles:
+                article_count.apply(
+                    db, scope="owner", scope_id=article.owner_id, delta=-1
+                )
+                article_count.apply(db, scope=TOTAL_SCOPE, scope_id=0, delta=-1)
+                on_commit(db, partial(crud_article.cache.invalidate, article.id))
+                on_commit(db, partial(barcode_index.invalidate, article.id))
+                on_commit(db, partial(suggest_index.remove, article.id))
+                article_change = change.record(
+                    db,
+                    entity="article",
+                    entity_id=article.id,
+                    owner_id=article.owner_id,
+                    deleted=True,
+                )
+                event_hub.queue(
+                    db,
+                    Event(
+                        id=article_change.seq,
+                        type="article.deleted",
+                        owner_id=article.owner_id,
+                        supplier_id=db_obj.id,
+                    ),
+                )
 
 
-supplier = CRUDSupplier(Supplier)
+supplier = CRUDSupplier(
+    Supplier, cache=EntityCache(settings.CRUD_CACHE_SIZE, settings.CRUD_CACHE_TTL)
+)
+cache_sync.register("supplier", supplier.cache)
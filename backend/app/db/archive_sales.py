@@ -0,0 +1,38 @@
+"""
+Archive the sale line partitions of closed days into SQLite files.
+
+    python -m app.db.archive_sales <directory> [--keep-days 30]
+
+The rollups stay in the database, so reports still cover archived days.
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from app import crud
+from app.db.session import SessionLocal
+from app.models.sale import SalePartition
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("--keep-days", type=int, default=30)
+    args = parser.parse_args()
+    before = datetime.utcnow().date() - timedelta(days=max(args.keep_days, 1))
+    db = SessionLocal()
+    try:
+        days = [
+            day
+            for (day,) in db.query(SalePartition.day).filter(
+                SalePartition.day < before, SalePartition.archived.is_(False)
+            )
+        ]
+        for day in days:
+            path = crud.sale.archive(db, day=day, directory=args.directory)
+            print(f"{day}: {path}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
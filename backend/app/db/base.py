@@ -4,3 +4,19 @@ from app.models.base import Base  # noqa
 from app.models.user import User  # noqa
 from app.models.article import Article  # noqa
 from app.models.supplier import Supplier  # noqa
+from app.models.barcode import Barcode  # noqa
+from app.models.change import Change  # noqa
+from app.models.shard import (  # noqa
+    ArticleIdSequence,
+    ShardAssignment,
+    ShardAssignmentVersion,
+)
+from app.models.article_count import ArticleCount  # noqa
+from app.models.sale import (  # noqa
+    SalePartition,
+    SalesArticleDay,
+    SalesDay,
+    SalesSupplierDay,
+)
+from app.models.idempotency_key import IdempotencyKey  # noqa
+from app.models.request_profile import RequestProfile  # noqa
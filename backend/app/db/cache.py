@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.change import Change
+
+
+class EntityCache:
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0):
+        """
+        Bounded LRU cache of column values by primary key, entries expire
+        after `ttl` seconds.
+
+        `set` only stores values read under the current `generation`, so a
+        read that raced with an invalidation never repopulates stale values.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Any, values: Dict[str, Any], generation: int) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Any) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class CacheSync:
+    def __init__(self, interval: float):
+        """
+        Invalidates cache entries written by other workers.
+
+        At most every `interval` seconds the change feed is read from the last
+        sequence number seen, which is a range scan on its primary key. An
+        `interval` of 0 disables polling for single worker deployments.
+        """
+        self.caches: Dict[str, List[EntityCache]] = {}
+        self.interval = interval
+        self._last_seq: Optional[int] = None
+        self._next_poll = 0.0
+        self._lock = threading.Lock()
+
+    def register(self, entity: str, cache: EntityCache) -> None:
+        """
+        Add a cache of `entity` rows; anything with `invalidate(id)` and
+        `clear()` can be registered. Caches kept per owner may also have
+        `invalidate_owned(id, owner_id)`, which is called instead.
+        """
+        self.caches.setdefault(entity, []).append(cache)
+
+    def poll(self, db: Session) -> None:
+        if self.interval <= 0:
+            return
+        now = time.monotonic()
+        if now < self._next_poll or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_poll = now + self.interval
+            if self._last_seq is None:
+                for caches in self.caches.values():
+                    for cache in caches:
+                        cache.clear()
+                self._last_seq = db.query(func.max(Change.seq)).scalar() or 0
+                return
+            changes = (
+                db.query(Change.seq, Change.entity, Change.entity_id, Change.owner_id)
+                .filter(Change.seq > self._last_seq)
+                .order_by(Change.seq)
+                .all()
+            )
+            for seq, entity, entity_id, owner_id in changes:
+                for cache in self.caches.get(entity, ()):
+                    invalidate_owned = getattr(cache, "invalidate_owned", None)
+                    if invalidate_owned is not None:
+                        invalidate_owned(entity_id, owner_id)
+                    else:
+                        cache.invalidate(entity_id)
+                self._last_seq = seq
+        finally:
+            self._lock.release()
+
+
+cache_sync = CacheSync(settings.CRUD_CACHE_SYNC_INTERVAL)
@@ -0,0 +1,104 @@
+"""
+Move the articles of one owner to another shard.
+
+    python -m app.db.rebalance <owner_id> <shard>
+
+Workers may keep writing to the old shard until they notice the move;
+those writes are carried over after it.
+"""
+import argparse
+import sys
+import time
+from typing import Dict
+
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.crud.base import GET_MANY_CHUNK_SIZE
+from app.db.shards import ShardRouter
+from app.models.article import Article
+
+
+def move_owner(router: ShardRouter, owner_id: int, target: str) -> int:
+    """
+    Copy the owner's articles to `target`, point the owner at `target` and
+    then remove the copied rows from the old shard. Returns the rows moved.
+
+    Workers keep using the old shard for up to the router's refresh
+    interval. Afterwards the old shard is compared with the first copy:
+    articles created, changed or deleted there meanwhile are created,
+    changed or deleted on `target`, unless a worker that already switched
+    changed them on `target` too, whose write wins. The moved articles are
+    put on the change feed, so workers drop cached copies that are still
+    keyed to the old shard.
+    """
+    if target not in router.shard_engines:
+        raise ValueError(f"Unknown shard: {target}")
+    source = router.shard_for(owner_id)
+    if source == target:
+        return 0
+    table = Article.__table__
+
+    def read(conn: Connection) -> Dict[int, dict]:
+        rows = conn.execute(select(table).where(table.c.owner_id == owner_id))
+        return {row["id"]: dict(row) for row in rows.mappings()}
+
+    with router.shard_engines[source].connect() as conn:
+        copied = read(conn)
+    if copied:
+        with router.shard_engines[target].begin() as conn:
+            conn.execute(table.insert(), list(copied.values()))
+    router.assign(owner_id, target)
+    time.sleep(router.refresh_interval)
+
+    with router.shard_engines[source].connect() as conn:
+        moved = read(conn)
+    with router.shard_engines[target].begin() as conn:
+        current = read(conn)
+        created = [row for id, row in moved.items() if id not in copied]
+        if created:
+            conn.execute(table.insert(), created)
+        for id, row in copied.items():
+            if current.get(id) != row:
+                # changed or deleted on `target` since the copy
+                continue
+            if id not in moved:
+                conn.execute(table.delete().where(table.c.id == id))
+            elif moved[id] != row:
+                conn.execute(table.update().where(table.c.id == id), moved[id])
+    ids = sorted(set(copied) | set(moved))
+    if ids:
+        with router.shard_engines[source].begin() as conn:
+            for start in range(0, len(ids), GET_MANY_CHUNK_SIZE):
+                chunk = ids[start : start + GET_MANY_CHUNK_SIZE]
+                conn.execute(table.delete().where(table.c.id.in_(chunk)))
+        db = Session(bind=router.default_engine)
+        try:
+            crud.change.record_many(
+                db, entity="article", rows=[(id, owner_id) for id in ids]
+            )
+            db.commit()
+        finally:
+            db.close()
+        for id in ids:
+            crud.article.cache.invalidate(id)
+    return len(moved)
+
+
+def main() -> None:
+    from app.db.session import shard_router
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("owner_id", type=int)
+    parser.add_argument("shard")
+    args = parser.parse_args()
+    if shard_router is None:
+        sys.exit("ARTICLE_SHARDS is not configured")
+    moved = move_owner(shard_router, args.owner_id, args.shard)
+    print(f"Moved {moved} articles of owner {args.owner_id} to {args.shard}.")
+
+
+if __name__ == "__main__":
+    main()
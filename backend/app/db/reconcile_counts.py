@@ -0,0 +1,25 @@
+"""
+Recount the article counters and repair any drift.
+
+    python -m app.db.reconcile_counts
+
+Run it once to seed the counters for existing articles, and whenever the
+totals are suspected to be off.
+"""
+from app import crud
+from app.db.session import SessionLocal
+
+
+def main() -> None:
+    db = SessionLocal()
+    try:
+        repaired = crud.article_count.reconcile(db)
+    finally:
+        db.close()
+    for (scope, scope_id), (old, new) in sorted(repaired.items()):
+        print(f"{scope} {scope_id}: {old} -> {new}")
+    print(f"Repaired {len(repaired)} counters.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Provision a terminal's database from a catalog snapshot.
+
+    python -m app.db.restore_snapshot <file or URL> [--token TOKEN]
+
+The snapshot is a file downloaded from `GET /api/v1/admin/snapshot`, or that
+URL itself with a superuser's access token. Users, suppliers, articles and
+barcodes of the database in DATABASE_URL are replaced in one transaction; a
+snapshot that does not match its checksum leaves the database untouched.
+Afterwards the terminal catches up through `/articles/changes?since=<seq>`.
+"""
+import argparse
+import sys
+import urllib.request
+from typing import IO
+
+from app import crud
+from app.core.config import settings
+from app.db.base import Base
+from app.db.session import SessionLocal, engine
+from app.services.snapshot_service import snapshot_service
+
+
+def _open(source: str, token: str = None) -> IO[bytes]:
+    if not source.startswith(("http://", "https://")):
+        return open(source, "rb")
+    request = urllib.request.Request(source)
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    return urllib.request.urlopen(request)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source")
+    parser.add_argument("--token")
+    args = parser.parse_args()
+    if settings.ARTICLE_SHARDS:
+        sys.exit("Snapshots restore into a single database, unset ARTICLE_SHARDS.")
+    Base.metadata.create_all(bind=engine)
+    try:
+        with _open(args.source, args.token) as fileobj, engine.begin() as conn:
+            trailer = snapshot_service.restore(conn, fileobj)
+    except (ValueError, OSError) as e:
+        # OSError covers unreadable sources and files that aren't gzipped
+        sys.exit(f"Snapshot not restored: {e}")
+    db = SessionLocal()
+    try:
+        crud.article_count.reconcile(db)
+    finally:
+        db.close()
+    rows = ", ".join(f"{count} {table}" for table, count in trailer["rows"].items())
+    print(f"Restored {rows}.")
+    print(f"Catch up with /articles/changes?since={trailer['seq']}")
+
+
+if __name__ == "__main__":
+    main()
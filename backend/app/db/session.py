@@ -2,6 +2,24 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.db.shards import ShardRouter
+from app.db.transaction import begin_explicitly
 
 engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+begin_explicitly(engine)
+
+shard_router = None
+if settings.ARTICLE_SHARDS:
+    shard_router = ShardRouter(
+        engine,
+        {
+            name: create_engine(url, pool_pre_ping=True)
+            for name, url in settings.ARTICLE_SHARDS.items()
+        },
+        refresh_interval=settings.ARTICLE_SHARD_REFRESH_INTERVAL,
+    )
+    for shard_engine in shard_router.shard_engines.values():
+        begin_explicitly(shard_engine)
+    SessionLocal = shard_router.sessionmaker()
+else:
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
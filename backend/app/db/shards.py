@@ -0,0 +1,159 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models.article import Article
+from app.models.shard import (
+    ArticleIdSequence,
+    ShardAssignment,
+    ShardAssignmentVersion,
+)
+
+DEFAULT_SHARD = "default"
+
+
+class ShardRouter:
+    def __init__(
+        self,
+        default_engine: Engine,
+        shard_engines: Dict[str, Engine],
+        refresh_interval: float = 1.0,
+    ):
+        """
+        Routes articles to one of several databases by `owner_id`.
+
+        Every other table stays in the default database. An owner's articles
+        live on the shard recorded in `article_shards`, or else on the shard
+        picked by `owner_id` modulo the number of shards.
+
+        Assignments are cached per process. Every change bumps the version in
+        `article_shard_versions`, which is checked at most every
+        `refresh_interval` seconds; a newer version drops the cache.
+
+        A write to the articles of a shard and to the default database are
+        committed separately and in no fixed order. If one commit fails after
+        the other succeeded, the change feed and the article counters can
+        miss or show a write that the shard does not; the counters are
+        repaired by `app.db.reconcile_counts`, a missed feed entry shows up
+        with the article's next change.
+
+        **Parameters**
+
+        * `default_engine`: Engine of the database holding all other tables
+        * `shard_engines`: Engines of the article shards by shard name
+        * `refresh_interval`: Seconds between checks for assignments changed
+          by other processes
+        """
+        if not shard_engines or DEFAULT_SHARD in shard_engines:
+            raise ValueError("Article shards must be named and not 'default'")
+        self.default_engine = default_engine
+        self.shard_engines = shard_engines
+        self.shard_names = sorted(shard_engines)
+        self.refresh_interval = refresh_interval
+        self._assignments: Dict[int, str] = {}
+        self._version: Optional[int] = None
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def sessionmaker(self) -> sessionmaker:
+        return sessionmaker(
+            class_=ShardedSession,
+            autocommit=False,
+            autoflush=False,
+            shards={DEFAULT_SHARD: self.default_engine, **self.shard_engines},
+            shard_chooser=self._shard_chooser,
+            id_chooser=self._id_chooser,
+            execute_chooser=self._execute_chooser,
+            info={"shard_router": self},
+        )
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if now < self._next_refresh:
+            return
+        with self._lock:
+            if now < self._next_refresh:
+                return
+            with self.default_engine.connect() as conn:
+                version = conn.execute(
+                    select(func.max(ShardAssignmentVersion.id))
+                ).scalar()
+            if version != self._version:
+                self._assignments = {}
+                self._version = version
+            self._next_refresh = now + self.refresh_interval
+
+    def shard_for(self, owner_id: Optional[int]) -> str:
+        if owner_id is None:
+            return self.shard_names[0]
+        self._refresh()
+        shard = self._assignments.get(owner_id)
+        if shard is None:
+            with self.default_engine.connect() as conn:
+                shard = conn.execute(
+                    select(ShardAssignment.shard).where(
+                        ShardAssignment.owner_id == owner_id
+                    )
+                ).scalar()
+            if shard is None:
+                shard = self.shard_names[owner_id % len(self.shard_names)]
+            self._assignments[owner_id] = shard
+        return shard
+
+    def assign(self, owner_id: int, shard: str) -> None:
+        if shard not in self.shard_engines:
+            raise ValueError(f"Unknown shard: {shard}")
+        table = ShardAssignment.__table__
+        versions = ShardAssignmentVersion.__table__
+        with self.default_engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.owner_id == owner_id))
+            conn.execute(table.insert().values(owner_id=owner_id, shard=shard))
+            version = conn.execute(versions.insert()).inserted_primary_key[0]
+            conn.execute(versions.delete().where(versions.c.id < version))
+        self._assignments[owner_id] = shard
+
+    def next_article_id(self, db: Session) -> int:
+        """
+        Hand out an article id in the session's transaction on the default
+        database, which may already hold its write lock.
+        """
+        table = ArticleIdSequence.__table__
+        conn = db.connection(bind_arguments={"shard_id": DEFAULT_SHARD})
+        id = conn.execute(table.insert()).inserted_primary_key[0]
+        conn.execute(table.delete().where(table.c.id < id))
+        return id
+
+    def fan_out(self, fn: Callable[[Connection], Any]) -> Dict[str, Any]:
+        """
+        Run `fn` against every article shard in parallel, results by shard name.
+        """
+
+        def run(name: str) -> Any:
+            with self.shard_engines[name].connect() as conn:
+                return fn(conn)
+
+        with ThreadPoolExecutor(max_workers=len(self.shard_names)) as pool:
+            results = pool.map(run, self.shard_names)
+            return dict(zip(self.shard_names, results))
+
+    def _shard_chooser(self, mapper, instance, clause=None) -> str:
+        if mapper is not None and mapper.class_ is Article:
+            return self.shard_for(instance.owner_id if instance is not None else None)
+        return DEFAULT_SHARD
+
+    def _id_chooser(self, query, ident) -> List[str]:
+        if query.column_descriptions[0]["entity"] is Article:
+            return self.shard_names
+        return [DEFAULT_SHARD]
+
+    def _execute_chooser(self, context) -> List[str]:
+        mapper = context.bind_mapper
+        if mapper is not None and mapper.class_ is Article:
+            return self.shard_names
+        return [DEFAULT_SHARD]
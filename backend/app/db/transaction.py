@@ -0,0 +1,42 @@
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+
+def on_commit(db: Session, callback: Callable[[], None]) -> None:
+    """
+    Run `callback` once the session's transaction is committed. Callbacks of a
+    transaction that is rolled back are discarded.
+    """
+    db.info.setdefault("after_commit", []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session) -> None:
+    for callback in session.info.pop("after_commit", []):
+        callback()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_commit(session: Session, previous_transaction) -> None:
+    session.info.pop("after_commit", None)
+
+
+def begin_explicitly(engine: Engine) -> None:
+    """
+    Let SQLAlchemy begin the transactions of a SQLite `engine`. pysqlite only
+    begins one before the first write, so a savepoint taken earlier became the
+    outer transaction and releasing it committed.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record) -> None:
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn) -> None:
+        conn.exec_driver_sql("BEGIN")
@@ -1,5 +1,6 @@
 from fastapi import FastAPI, APIRouter
-from app.routes import articles, suppliers, pos, auth
+from fastapi.middleware.gzip import GZipMiddleware
+from app.routes import admin, articles, suppliers, pos, auth
 from app.core.config import settings
 
 app = FastAPI(
@@ -12,5 +13,7 @@ api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(articles.router, prefix="/articles", tags=["articles"])
 api_router.include_router(suppliers.router, prefix="/suppliers", tags=["suppliers"])
 api_router.include_router(pos.router, prefix="/pos", tags=["pos"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
 
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE)
 app.include_router(api_router, prefix=settings.API_V1_STR)
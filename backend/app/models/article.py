@@ -17,3 +17,9 @@ class Article(Base):
 
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="articles")
+
+    barcodes = relationship(
+        "Barcode",
+        back_populates="article",
+        cascade="all, delete-orphan",
+    )
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String
+
+from .base import Base
+
+
+class ArticleCount(Base):
+    __tablename__ = "article_counts"
+
+    scope = Column(String(32), primary_key=True)
+    scope_id = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
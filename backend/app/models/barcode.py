@@ -0,0 +1,14 @@
+from sqlalchemy import Column, ForeignKey, Integer, String
+from sqlalchemy.orm import relationship
+
+from .base import Base
+
+
+class Barcode(Base):
+    __tablename__ = "barcodes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    code = Column(String(64), unique=True, index=True, nullable=False)
+
+    article_id = Column(Integer, ForeignKey("articles.id"), index=True, nullable=False)
+    article = relationship("Article", back_populates="barcodes")
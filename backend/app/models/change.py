@@ -0,0 +1,20 @@
+from sqlalchemy import Boolean, Column, Index, Integer, String, UniqueConstraint
+
+from .base import Base
+
+
+class Change(Base):
+    __tablename__ = "changes"
+    __table_args__ = (
+        UniqueConstraint("entity", "entity_id"),
+        Index("ix_changes_owner_id_seq", "owner_id", "seq"),
+        # never hand out a sequence number twice, even after the newest row
+        # was replaced
+        {"sqlite_autoincrement": True},
+    )
+
+    seq = Column(Integer, primary_key=True)
+    entity = Column(String(32), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    owner_id = Column(Integer)
+    deleted = Column(Boolean(), default=False, nullable=False)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String
+
+from .base import Base
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(Integer, primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # sha256 of method, path, query string and body of the first request
+    fingerprint = Column(String(64), nullable=False)
+    # NULL while the first request is in flight
+    status_code = Column(Integer)
+    media_type = Column(String(64))
+    body = Column(LargeBinary)
+    locked_until = Column(DateTime)
+    expires_at = Column(DateTime, nullable=False, index=True)
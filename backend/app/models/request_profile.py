@@ -0,0 +1,17 @@
+from sqlalchemy import Column, DateTime, Float, Integer, String, Text
+
+from .base import Base
+
+
+class RequestProfile(Base):
+    __tablename__ = "request_profiles"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False)
+    method = Column(String(8), nullable=False)
+    path = Column(String(2048), nullable=False)
+    status_code = Column(Integer)
+    duration = Column(Float, nullable=False)
+    interval = Column(Float, nullable=False)
+    # "frame;frame;frame count" lines, outermost frame first
+    stacks = Column(Text, nullable=False)
@@ -0,0 +1,74 @@
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Float,
+    Integer,
+    MetaData,
+    String,
+    Table,
+)
+
+from .base import Base
+
+# Per-day sale line tables are created on demand and kept out of
+# Base.metadata, so create_all() doesn't know about them.
+partition_metadata = MetaData()
+
+
+def sale_lines_table(name: str) -> Table:
+    if name in partition_metadata.tables:
+        return partition_metadata.tables[name]
+    return Table(
+        name,
+        partition_metadata,
+        Column("id", Integer, primary_key=True),
+        Column("sale_id", String(32), index=True, nullable=False),
+        Column("sold_at", DateTime, nullable=False),
+        Column("owner_id", Integer),
+        Column("article_id", Integer, nullable=False),
+        Column("supplier_id", Integer),
+        Column("quantity", Integer, nullable=False),
+        Column("unit_price", Float, nullable=False),
+        Column("amount", Float, nullable=False),
+    )
+
+
+class SalePartition(Base):
+    __tablename__ = "sale_partitions"
+
+    day = Column(Date, primary_key=True)
+    table_name = Column(String(64), nullable=False)
+    archived = Column(Boolean(), default=False, nullable=False)
+    archive_path = Column(String(255))
+
+
+class SalesDay(Base):
+    __tablename__ = "sales_days"
+
+    day = Column(Date, primary_key=True)
+    owner_id = Column(Integer, primary_key=True)
+    revenue = Column(Float, nullable=False, default=0.0)
+    quantity = Column(Integer, nullable=False, default=0)
+
+
+class SalesArticleDay(Base):
+    __tablename__ = "sales_article_days"
+
+    day = Column(Date, primary_key=True)
+    owner_id = Column(Integer, primary_key=True)
+    article_id = Column(Integer, primary_key=True)
+    revenue = Column(Float, nullable=False, default=0.0)
+    quantity = Column(Integer, nullable=False, default=0)
+
+
+class SalesSupplierDay(Base):
+    __tablename__ = "sales_supplier_days"
+
+    day = Column(Date, primary_key=True)
+    owner_id = Column(Integer, primary_key=True)
+    # 0 for articles without supplier, primary keys can't be NULL
+    supplier_id = Column(Integer, primary_key=True)
+    revenue = Column(Float, nullable=False, default=0.0)
+    quantity = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String
+
+from .base import Base
+
+
+class ShardAssignment(Base):
+    __tablename__ = "article_shards"
+
+    owner_id = Column(Integer, primary_key=True)
+    shard = Column(String(64), nullable=False)
+
+
+class ArticleIdSequence(Base):
+    __tablename__ = "article_id_sequence"
+    # article ids must stay unique across shards, so they are handed out by
+    # the default database instead of each shard's own autoincrement
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+
+
+class ShardAssignmentVersion(Base):
+    __tablename__ = "article_shard_versions"
+    # bumped by every change of `article_shards`, so routers of other
+    # processes notice that their cached assignments are stale
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
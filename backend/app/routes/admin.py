@@ -0,0 +1,115 @@
+import tempfile
+from typing import Any, Iterator, List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models.user import User
+from app.routes import deps
+from app.routes.profiling import ProfiledRoute
+from app.schemas.request_profile import RequestProfile
+from app.services.profiler import speedscope
+from app.services.snapshot_service import snapshot_service
+
+router = APIRouter(route_class=ProfiledRoute)
+
+# Bytes per chunk of a streamed snapshot, and bytes of it kept in memory
+SNAPSHOT_STREAM_CHUNK = 1024 * 1024
+SNAPSHOT_SPOOL_SIZE = 16 * 1024 * 1024
+
+
+@router.get("/cache")
+def read_cache_stats(
+    current_user: User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Hit, miss and eviction counters of the article and supplier read caches.
+    """
+    return {
+        "article": crud.article.cache.stats(),
+        "supplier": crud.supplier.cache.stats(),
+    }
+
+
+@router.get("/profiles", response_model=List[RequestProfile])
+def read_profiles(
+    db: Session = Depends(deps.get_db),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Retrieve the newest request profiles.
+    """
+    return crud.request_profile.get_multi(db, limit=limit)
+
+
+@router.get("/profiles/{id}")
+def read_profile(
+    *,
+    db: Session = Depends(deps.get_db),
+    id: int,
+    format: str = Query("speedscope", regex="^(speedscope|collapsed)$"),
+    current_user: User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Get a request profile as speedscope JSON, or as collapsed stacks for
+    flamegraph.pl and similar tools.
+    """
+    profile = crud.request_profile.get(db, id=id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "collapsed":
+        return PlainTextResponse(profile.stacks)
+    return speedscope(
+        f"{profile.method} {profile.path}", profile.stacks, profile.interval
+    )
+
+
+@router.get("/snapshot")
+def read_snapshot(
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Download a compressed, consistent snapshot of users, suppliers, articles
+    and barcodes to provision a new terminal with `app.db.restore_snapshot`.
+
+    The `X-Snapshot-Seq` header holds the change feed sequence number to
+    catch up from, `X-Snapshot-SHA256` the checksum the snapshot ends with.
+    """
+    # written in full first, the database is only read for the copy
+    spool = tempfile.SpooledTemporaryFile(max_size=SNAPSHOT_SPOOL_SIZE)
+    try:
+        trailer = snapshot_service.write(db, spool)
+    except Exception:
+        spool.close()
+        raise
+    size = spool.tell()
+    spool.seek(0)
+
+    def chunks() -> Iterator[bytes]:
+        try:
+            while True:
+                chunk = spool.read(SNAPSHOT_STREAM_CHUNK)
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            spool.close()
+
+    seq = trailer["seq"]
+    return StreamingResponse(
+        chunks(),
+        media_type="application/gzip",
+        headers={
+            # the file itself is gzipped, clients must keep it compressed;
+            # any Content-Encoding makes GZipMiddleware pass it through
+            "Content-Encoding": "identity",
+            "Content-Length": str(size),
+            "Content-Disposition": f'attachment; filename="snapshot-{seq}.ndjson.gz"',
+            "X-Snapshot-Seq": str(seq),
+            "X-Snapshot-SHA256": trailer["sha256"],
+        },
+    )
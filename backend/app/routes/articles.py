@@ -1,33 +1,296 @@
-from typing import Any, List
+import asyncio
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app import crud
-from app.schemas.article import Article, ArticleCreate, ArticleUpdate
+from app.crud.article import ARTICLE_FIELDS, ARTICLE_RELATIONS
+from app.schemas.article import (
+    Article,
+    ArticleBatch,
+    ArticleCreate,
+    ArticleSparse,
+    ArticleSuggestion,
+    ArticleUpdate,
+)
+from app.schemas.batch import BatchGet
+from app.schemas.change import ChangeFeed
+from app.schemas.event import Event
+from app.schemas.repricing import RepricingResult, RepricingRules
+from app.schemas.supplier import Supplier as SupplierSchema
+from app.schemas.user import User as UserSchema
+from app.models.article import Article as ArticleModel
 from app.models.user import User
 from app.routes import deps
+from app.routes.idempotency import IdempotentRoute
+from app.services.event_hub import Subscriber, event_hub
+from app.services.repricing_service import repricing_service
+from app.services.suggest_index import SUGGEST_MAX_LIMIT, suggest_index
 
-router = APIRouter()
+router = APIRouter(route_class=IdempotentRoute)
 
+# Seconds between keep-alive comments on an idle event stream
+EVENT_KEEPALIVE = 15.0
 
-@router.get("/", response_model=List[Article])
+
+def _check_barcodes(
+    db: Session, codes: Optional[List[str]], id: Optional[int] = None
+) -> None:
+    taken = []
+    for code in codes or []:
+        article = crud.article.get_by_barcode(db, code=code)
+        if article is not None and article.id != id:
+            taken.append(code)
+    if taken:
+        raise HTTPException(
+            status_code=400, detail=f"Barcode already in use: {', '.join(taken)}"
+        )
+
+
+@contextmanager
+def _barcodes_unique(
+    db: Session, codes: Optional[List[str]], id: Optional[int] = None
+) -> Iterator[None]:
+    # a concurrent request can take a code between the check and the write,
+    # the unique index then rejects it
+    try:
+        yield
+    except IntegrityError:
+        db.rollback()
+        _check_barcodes(db, codes, id)
+        raise
+
+
+def _parse_list(value: Optional[str], allowed: tuple, name: str) -> List[str]:
+    requested = [item.strip() for item in (value or "").split(",") if item.strip()]
+    unknown = [item for item in requested if item not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown {name}: {', '.join(unknown)}"
+        )
+    return requested
+
+
+def _sparse_article(
+    article: ArticleModel, fields: List[str], expand: List[str]
+) -> Dict[str, Any]:
+    data = {field: getattr(article, field) for field in fields}
+    if "owner" in expand:
+        data["owner"] = UserSchema.from_orm(article.owner).dict()
+    if "supplier" in expand:
+        supplier = article.supplier
+        if supplier is not None:
+            supplier = SupplierSchema.from_orm(supplier).dict()
+        data["supplier"] = supplier
+    return data
+
+
+@router.get("/", response_model=Union[List[Article], List[ArticleSparse]])
 def read_articles(
+    response: Response,
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
+    supplier_id: Optional[int] = None,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    total: bool = False,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    Retrieve articles.
+    Retrieve articles, optionally only those of the supplier `supplier_id`.
+
+    `fields` (comma separated columns, `id` is always included) and `expand`
+    (`owner`, `supplier`) return a sparse payload, see `ArticleSparse`: only
+    the selected columns and relationships are loaded and returned. With
+    `expand` alone all columns are returned. Empty values return full
+    articles.
+
+    With `total` the number of all matching articles is returned in the
+    `X-Total-Count` header.
     """
-    if crud.user.is_superuser(current_user):
-        articles = crud.article.get_multi(db, skip=skip, limit=limit)
+    owner_id = None if crud.user.is_superuser(current_user) else current_user.id
+    selected = _parse_list(fields, ARTICLE_FIELDS, "fields")
+    relations = _parse_list(expand, ARTICLE_RELATIONS, "expand")
+    if selected or relations:
+        columns = list(ARTICLE_FIELDS)
+        if selected:
+            columns = [
+                field for field in ARTICLE_FIELDS if field in selected or field == "id"
+            ]
+        articles = crud.article.get_multi_sparse(
+            db,
+            fields=columns,
+            expand=relations,
+            owner_id=owner_id,
+            supplier_id=supplier_id,
+            skip=skip,
+            limit=limit,
+        )
+        result = JSONResponse(
+            [_sparse_article(article, columns, relations) for article in articles]
+        )
+    elif owner_id is None:
+        result = crud.article.get_multi(
+            db, supplier_id=supplier_id, skip=skip, limit=limit
+        )
     else:
-        articles = crud.article.get_multi_by_owner(
-            db=db, owner_id=current_user.id, skip=skip, limit=limit
+        result = crud.article.get_multi_by_owner(
+            db=db, owner_id=owner_id, supplier_id=supplier_id, skip=skip, limit=limit
+        )
+    if total:
+        # a returned response doesn't get the headers set on `response`
+        headers = result.headers if isinstance(result, Response) else response.headers
+        headers["X-Total-Count"] = str(
+            crud.article.count(db, owner_id=owner_id, supplier_id=supplier_id)
+        )
+    return result
+
+
+@router.get("/changes", response_model=ChangeFeed)
+def read_article_changes(
+    db: Session = Depends(deps.get_db),
+    since: int = 0,
+    limit: int = Query(500, ge=1, le=1000),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Retrieve article and supplier changes after the sequence number `since`.
+
+    Only the latest change per entity is returned; deletes are tombstones
+    without data. Superusers see all changes, other users only changes to
+    their own articles.
+    """
+    owner_id = None if crud.user.is_superuser(current_user) else current_user.id
+    changes = crud.change.get_since(
+        db, since=since, owner_id=owner_id, limit=limit + 1
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    live = {"article": [], "supplier": []}
+    for change in changes:
+        if not change.deleted:
+            live[change.entity].append(change.entity_id)
+    loaded = {
+        "article": {a.id: a for a in crud.article.get_many(db, live["article"])},
+        "supplier": {s.id: s for s in crud.supplier.get_many(db, live["supplier"])},
+    }
+    items = []
+    for change in changes:
+        items.append(
+            {
+                "seq": change.seq,
+                "entity": change.entity,
+                "id": change.entity_id,
+                "deleted": change.deleted,
+                change.entity: loaded[change.entity].get(change.entity_id),
+            }
         )
-    return articles
+    return {
+        "changes": items,
+        "last_seq": changes[-1].seq if changes else since,
+        "has_more": has_more,
+    }
+
+
+@router.get("/suggest", response_model=List[ArticleSuggestion])
+def suggest_articles(
+    db: Session = Depends(deps.get_db),
+    prefix: str = Query(..., min_length=1, max_length=255),
+    limit: int = Query(10, ge=1, le=SUGGEST_MAX_LIMIT),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Suggest articles whose name starts with `prefix`, most sold first.
+
+    Case, accents and repeated spaces are ignored. Superusers get suggestions
+    from all articles, other users from their own.
+    """
+    owner_id = None if crud.user.is_superuser(current_user) else current_user.id
+    suggestions = suggest_index.suggest(
+        db, prefix, owner_id=owner_id, limit=limit
+    )
+    return [
+        {"id": id, "name": name, "score": score} for id, name, score in suggestions
+    ]
+
+
+def _format_event(event: Event) -> str:
+    return f"id: {event.id}\nevent: {event.type}\ndata: {event.json()}\n\n"
+
+
+async def _event_stream(
+    request: Request, subscriber: Subscriber, replay: List[Event]
+) -> AsyncIterator[str]:
+    last_id = 0
+    try:
+        for event in replay:
+            last_id = event.id
+            yield _format_event(event)
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(
+                    subscriber.queue.get(), timeout=EVENT_KEEPALIVE
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                # too slow to keep up, the client reconnects and replays
+                break
+            if event.id > last_id:
+                yield _format_event(event)
+    finally:
+        event_hub.unsubscribe(subscriber)
+
+
+@router.get("/events")
+async def stream_article_events(
+    request: Request,
+    db: Session = Depends(deps.get_db),
+    owner_id: Optional[int] = None,
+    supplier_id: Optional[int] = None,
+    last_event_id: Optional[int] = Header(None),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Stream article and supplier changes as Server-Sent Events.
+
+    Event ids are change sequence numbers. On reconnect with `Last-Event-ID`
+    missed events are replayed from a short buffer; if they are no longer
+    buffered a `resync` event asks the client to catch up through
+    `/articles/changes?since=<id>` instead.
+
+    Users other than superusers only receive events for their own articles;
+    with `supplier_id` those of their articles from that supplier. Supplier
+    events are only streamed to superusers, like the suppliers themselves.
+    """
+    if not crud.user.is_superuser(current_user):
+        owner_id = current_user.id
+    # the stream can stay open for hours, don't hold a connection meanwhile
+    db.close()
+    subscriber = event_hub.subscribe(owner_id=owner_id, supplier_id=supplier_id)
+    replay: List[Event] = []
+    if last_event_id is not None:
+        replay = event_hub.replay(subscriber, last_event_id)
+        if replay is None:
+            replay = [Event(id=last_event_id, type="resync")]
+    return StreamingResponse(
+        _event_stream(request, subscriber, replay), media_type="text/event-stream"
+    )
 
 
 @router.post("/", response_model=Article)
@@ -40,10 +303,64 @@ def create_article(
     """
     Create new article.
     """
-    article = crud.article.create_with_owner(db=db, obj_in=article_in, owner_id=current_user.id)
+    _check_barcodes(db, article_in.barcodes)
+    with _barcodes_unique(db, article_in.barcodes):
+        article = crud.article.create_with_owner(db=db, obj_in=article_in, owner_id=current_user.id)
     return article
 
 
+@router.post("/batch-get", response_model=ArticleBatch)
+def batch_get_articles(
+    *,
+    db: Session = Depends(deps.get_db),
+    batch_in: BatchGet,
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Get several articles by ID in one request.
+
+    Articles that do not exist or belong to another user are reported in
+    `missing`.
+    """
+    if crud.user.is_superuser(current_user):
+        articles = crud.article.get_many(db, batch_in.ids)
+    else:
+        articles = crud.article.get_many_by_owner(
+            db, batch_in.ids, owner_id=current_user.id
+        )
+    found = {article.id for article in articles}
+    missing = [id for id in dict.fromkeys(batch_in.ids) if id not in found]
+    return {"items": articles, "missing": missing}
+
+
+@router.post("/repricing/preview", response_model=RepricingResult)
+def preview_repricing(
+    *,
+    db: Session = Depends(deps.get_db),
+    rules: RepricingRules,
+    limit: int = Query(100, ge=0, le=10000),
+    current_user: User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Show the price changes a repricing run would make, without writing them.
+    """
+    return repricing_service.preview(db, rules=rules, limit=limit)
+
+
+@router.post("/repricing/apply", response_model=RepricingResult)
+def apply_repricing(
+    *,
+    db: Session = Depends(deps.get_db),
+    rules: RepricingRules,
+    limit: int = Query(100, ge=0, le=10000),
+    current_user: User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Reprice articles by the given rules in one transaction.
+    """
+    return repricing_service.apply(db, rules=rules, limit=limit)
+
+
 @router.put("/{id}", response_model=Article)
 def update_article(
     *,
@@ -60,7 +377,9 @@ def update_article(
         raise HTTPException(status_code=404, detail="Article not found")
     if not crud.user.is_superuser(current_user) and (article.owner_id != current_user.id):
         raise HTTPException(status_code=400, detail="Not enough permissions")
-    article = crud.article.update(db=db, db_obj=article, obj_in=article_in)
+    _check_barcodes(db, article_in.barcodes, id)
+    with _barcodes_unique(db, article_in.barcodes, id):
+        article = crud.article.update(db=db, db_obj=article, obj_in=article_in)
     return article
 
 
@@ -10,8 +10,9 @@ from app.schemas.user import User, UserCreate
 from app.core import security
 from app.core.config import settings
 from app.routes import deps
+from app.routes.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 
 @router.post("/login/access-token", response_model=Token)
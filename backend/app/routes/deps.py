@@ -1,6 +1,7 @@
-from typing import Generator
+from contextlib import contextmanager
+from typing import Generator, Iterator, Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from pydantic import ValidationError
@@ -26,6 +27,36 @@ def get_db() -> Generator:
         db.close()
 
 
+@contextmanager
+def request_session(request: Request) -> Iterator[Session]:
+    """
+    A session from `get_db` for code that runs outside of dependencies, with
+    the app's dependency overrides applied.
+    """
+    sessions = request.app.dependency_overrides.get(get_db, get_db)()
+    try:
+        yield next(sessions)
+    finally:
+        sessions.close()
+
+
+def get_token_user_id(request: Request) -> Optional[int]:
+    """
+    User ID of the request's bearer token if it is valid, for code that runs
+    outside of dependencies.
+    """
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    try:
+        payload = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+        )
+        return TokenPayload(**payload).sub
+    except (jwt.JWTError, ValidationError):
+        return None
+
+
 def get_current_user(
     db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
 ) -> User:
@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import time
+from typing import Callable, Coroutine
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+from app import crud
+from app.core.config import settings
+from app.routes import deps
+from app.routes.profiling import ProfiledRoute
+
+IDEMPOTENT_METHODS = ("POST", "PUT")
+# Seconds between checks of a key held by a concurrent duplicate
+IDEMPOTENCY_POLL_INTERVAL = 0.05
+
+
+def fingerprint(method: str, path: str, query: str, body: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in (method, path, query):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class IdempotentRoute(ProfiledRoute):
+    """
+    Route that honours an `Idempotency-Key` header on POST and PUT.
+
+    The first request with a key runs and its response is stored for
+    IDEMPOTENCY_KEY_TTL seconds; retries with the same key get the stored
+    response, marked with `Idempotent-Replayed: true`, without running the
+    endpoint again. A retry arriving while the first request still runs waits
+    up to IDEMPOTENCY_WAIT seconds for it and otherwise gets a 409. A key
+    reused for a different request gets a 422. Keys are per user.
+
+    Responses with a 5xx status and requests that raise are not stored, so
+    their retries run again.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine]:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            key = request.headers.get("Idempotency-Key")
+            if key is None or request.method not in IDEMPOTENT_METHODS:
+                return await handler(request)
+            if not 0 < len(key) <= 255:
+                return JSONResponse(
+                    {"detail": "Invalid Idempotency-Key"}, status_code=400
+                )
+            user_id = deps.get_token_user_id(request)
+            if user_id is None:
+                # not authenticated, the endpoint rejects it
+                return await handler(request)
+            request_fingerprint = fingerprint(
+                request.method,
+                request.url.path,
+                request.url.query,
+                await request.body(),
+            )
+            with deps.request_session(request) as db:
+                deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+                while True:
+                    db_obj, claimed = await run_in_threadpool(
+                        crud.idempotency_key.claim,
+                        db,
+                        user_id=user_id,
+                        key=key,
+                        fingerprint=request_fingerprint,
+                    )
+                    if claimed:
+                        break
+                    if db_obj.fingerprint != request_fingerprint:
+                        detail = "Idempotency-Key was used for another request"
+                        return JSONResponse({"detail": detail}, status_code=422)
+                    if db_obj.status_code is not None:
+                        return Response(
+                            db_obj.body,
+                            status_code=db_obj.status_code,
+                            media_type=db_obj.media_type,
+                            headers={"Idempotent-Replayed": "true"},
+                        )
+                    if time.monotonic() >= deadline:
+                        detail = "A request with this Idempotency-Key is in progress"
+                        return JSONResponse({"detail": detail}, status_code=409)
+                    await asyncio.sleep(IDEMPOTENCY_POLL_INTERVAL)
+
+                try:
+                    response = await handler(request)
+                except Exception:
+                    await run_in_threadpool(
+                        crud.idempotency_key.release, db, user_id=user_id, key=key
+                    )
+                    raise
+                if response.status_code < 500 and hasattr(response, "body"):
+                    await run_in_threadpool(
+                        crud.idempotency_key.complete,
+                        db,
+                        user_id=user_id,
+                        key=key,
+                        status_code=response.status_code,
+                        media_type=response.media_type,
+                        body=response.body,
+                    )
+                else:
+                    await run_in_threadpool(
+                        crud.idempotency_key.release, db, user_id=user_id, key=key
+                    )
+                return response
+
+        return route_handler
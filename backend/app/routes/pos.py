@@ -1,8 +1,80 @@
-from fastapi import APIRouter
+from datetime import date
+from typing import Any, Optional
 
-router = APIRouter()
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models.user import User
+from app.routes import deps
+from app.routes.idempotency import IdempotentRoute
+from app.schemas.pos import ScanResult
+from app.schemas.sale import ReportGrouping, Sale, SaleCreate, SalesReport
+from app.services.barcode_index import barcode_index
+from app.services.sales_service import sales_service
+
+router = APIRouter(route_class=IdempotentRoute)
 
 
 @router.get("/")
 def read_pos_stub():
     return {"message": "This is a stub for the Point of Sale (POS) endpoints."}
+
+
+@router.get("/scan/{code}", response_model=ScanResult)
+def scan_barcode(
+    *,
+    db: Session = Depends(deps.get_db),
+    code: str,
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Resolve a scanned barcode to an article.
+    """
+    entry = barcode_index.lookup(db, code)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Barcode not found")
+    id, name, price, owner_id = entry
+    if not crud.user.is_superuser(current_user) and (owner_id != current_user.id):
+        raise HTTPException(status_code=404, detail="Barcode not found")
+    return {"code": code, "id": id, "name": name, "price": price}
+
+
+@router.post("/sales", response_model=Sale)
+def create_sale(
+    *,
+    db: Session = Depends(deps.get_db),
+    sale_in: SaleCreate,
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Record a sale.
+    """
+    owner_id = None if crud.user.is_superuser(current_user) else current_user.id
+    try:
+        return sales_service.record_sale(db, obj_in=sale_in, owner_id=owner_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/reports/{group_by}", response_model=SalesReport)
+def read_sales_report(
+    *,
+    db: Session = Depends(deps.get_db),
+    group_by: ReportGrouping,
+    start: date,
+    end: date,
+    owner_id: Optional[int] = None,
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Revenue and quantity per day, article or supplier between two days.
+
+    Superusers may filter by `owner_id`, other users only see their own sales.
+    """
+    if not crud.user.is_superuser(current_user):
+        owner_id = current_user.id
+    rows = crud.sale.report(
+        db, group_by=group_by.value, start=start, end=end, owner_id=owner_id
+    )
+    return {"group_by": group_by, "start": start, "end": end, "rows": rows}
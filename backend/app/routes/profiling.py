@@ -0,0 +1,210 @@
+import copy
+import functools
+import inspect
+import random
+import sys
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Coroutine, Iterator, Optional
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute, get_request_handler
+from pydantic.fields import ModelField
+
+from app import crud
+from app.core.config import settings
+from app.routes import deps
+from app.services.profiler import Sampler
+
+PROFILE_HEADER = "X-Profile"
+# Sampler of the profiled request, copied into the worker threads it uses
+_sampler: ContextVar[Optional[Sampler]] = ContextVar("sampler", default=None)
+
+
+def _call_sampled(call: Callable, *args: Any, **kwargs: Any) -> Any:
+    # worker thread stacks of a profiled request start below this frame
+    sampler = _sampler.get()
+    if sampler is None:
+        return call(*args, **kwargs)
+    with sampler.thread():
+        return call(*args, **kwargs)
+
+
+def _sampled(call: Callable) -> Callable:
+    """
+    Wrap a sync endpoint or dependency so the worker thread running it for a
+    profiled request is sampled, and only for that request. Anything else,
+    which runs on the event loop, is returned as is.
+    """
+    if inspect.isgeneratorfunction(call):
+
+        @functools.wraps(call)
+        def generator(*args: Any, **kwargs: Any) -> Iterator[Any]:
+            # setup and teardown may run in different worker threads
+            gen = call(*args, **kwargs)
+            resume = functools.partial(next, gen)
+            while True:
+                try:
+                    value = _call_sampled(resume)
+                except StopIteration:
+                    return
+                try:
+                    yield value
+                except BaseException as e:
+                    resume = functools.partial(gen.throw, e)
+                else:
+                    resume = functools.partial(next, gen)
+
+        return generator
+    if not (inspect.isfunction(call) or inspect.ismethod(call)) or (
+        inspect.iscoroutinefunction(call) or inspect.isasyncgenfunction(call)
+    ):
+        return call
+
+    @functools.wraps(call)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return _call_sampled(call, *args, **kwargs)
+
+    return wrapper
+
+
+class _SampledField(ModelField):
+    # validates the responses of sync endpoints in a worker thread
+    __slots__ = ()
+
+    def validate(self, *args: Any, **kwargs: Any) -> Any:
+        return _call_sampled(super().validate, *args, **kwargs)
+
+
+class _SampledOverrides:
+    """
+    Dependency overrides of profiled requests: FastAPI looks every dependency
+    up here, which returns the app's override, or the dependency itself,
+    wrapped by `_sampled`.
+    """
+
+    def __init__(self, provider: Any):
+        self.provider = provider
+
+    @property
+    def dependency_overrides(self) -> "_SampledOverrides":
+        return self
+
+    def __bool__(self) -> bool:
+        return True
+
+    def get(self, call: Callable, default: Any = None) -> Callable:
+        overrides = getattr(self.provider, "dependency_overrides", None) or {}
+        return _sampled(overrides.get(call, call))
+
+
+def _is_superuser(request: Request) -> bool:
+    user_id = deps.get_token_user_id(request)
+    if user_id is None:
+        return False
+    with deps.request_session(request) as db:
+        user = crud.user.get(db, id=user_id)
+        return (
+            user is not None
+            and crud.user.is_active(user)
+            and crud.user.is_superuser(user)
+        )
+
+
+def _store(
+    request: Request,
+    response: Optional[Response],
+    duration: float,
+    stacks: str,
+) -> int:
+    path = request.url.path
+    if request.url.query:
+        path = f"{path}?{request.url.query}"
+    with deps.request_session(request) as db:
+        profile = crud.request_profile.create(
+            db,
+            created_at=datetime.utcnow(),
+            method=request.method,
+            path=path,
+            status_code=None if response is None else response.status_code,
+            duration=duration,
+            interval=settings.PROFILE_INTERVAL,
+            stacks=stacks,
+        )
+        return profile.id
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Route that profiles requests a superuser asks for with the `X-Profile`
+    header, and a PROFILE_SAMPLE_RATE share of all requests.
+
+    A profiled request is sampled from a background thread: the event loop
+    while it runs the request, and the worker threads while they run its
+    sync endpoint, dependencies or response validation. Profiled requests
+    are handled by a second handler whose sync calls are wrapped to mark
+    their threads; concurrent requests in other worker threads aren't
+    sampled. The profile is stored, its ID returned in the `X-Profile-Id`
+    header and it can be read from `/admin/profiles`. Requests that aren't
+    profiled run unchanged.
+    """
+
+    def _profiled_handler(self) -> Callable[[Request], Coroutine]:
+        dependant = copy.copy(self.dependant)
+        dependant.call = _sampled(dependant.call)
+        response_field = self.secure_cloned_response_field
+        if response_field is not None:
+            response_field = copy.copy(response_field)
+            response_field.__class__ = _SampledField
+        return get_request_handler(
+            dependant=dependant,
+            body_field=self.body_field,
+            status_code=self.status_code,
+            response_class=self.response_class,
+            response_field=response_field,
+            response_model_include=self.response_model_include,
+            response_model_exclude=self.response_model_exclude,
+            response_model_by_alias=self.response_model_by_alias,
+            response_model_exclude_unset=self.response_model_exclude_unset,
+            response_model_exclude_defaults=self.response_model_exclude_defaults,
+            response_model_exclude_none=self.response_model_exclude_none,
+            dependency_overrides_provider=_SampledOverrides(
+                self.dependency_overrides_provider
+            ),
+        )
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine]:
+        handler = super().get_route_handler()
+        profiled_handler = self._profiled_handler()
+        codes = frozenset([_call_sampled.__code__])
+
+        async def route_handler(request: Request) -> Response:
+            if PROFILE_HEADER in request.headers:
+                profiled = await run_in_threadpool(_is_superuser, request)
+            else:
+                rate = settings.PROFILE_SAMPLE_RATE
+                profiled = rate > 0 and random.random() < rate
+            if not profiled:
+                return await handler(request)
+
+            sampler = Sampler(settings.PROFILE_INTERVAL, sys._getframe(), codes)
+            response = None
+            started = time.perf_counter()
+            sampler.start()
+            token = _sampler.set(sampler)
+            try:
+                response = await profiled_handler(request)
+                return response
+            finally:
+                _sampler.reset(token)
+                duration = time.perf_counter() - started
+                stacks = sampler.stop()
+                profile_id = await run_in_threadpool(
+                    _store, request, response, duration, stacks
+                )
+                if response is not None:
+                    response.headers["X-Profile-Id"] = str(profile_id)
+
+        return route_handler
@@ -4,11 +4,18 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from app import crud
-from app.schemas.supplier import Supplier, SupplierCreate, SupplierUpdate
+from app.schemas.batch import BatchGet
+from app.schemas.supplier import (
+    Supplier,
+    SupplierBatch,
+    SupplierCreate,
+    SupplierUpdate,
+)
 from app.models.user import User
 from app.routes import deps
+from app.routes.idempotency import IdempotentRoute
 
-router = APIRouter()
+router = APIRouter(route_class=IdempotentRoute)
 
 
 @router.get("/", response_model=List[Supplier])
@@ -39,6 +46,22 @@ def create_supplier(
     return supplier
 
 
+@router.post("/batch-get", response_model=SupplierBatch)
+def batch_get_suppliers(
+    *,
+    db: Session = Depends(deps.get_db),
+    batch_in: BatchGet,
+    current_user: User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Get several suppliers by ID in one request.
+    """
+    suppliers = crud.supplier.get_many(db, batch_in.ids)
+    found = {supplier.id for supplier in suppliers}
+    missing = [id for id in dict.fromkeys(batch_in.ids) if id not in found]
+    return {"items": suppliers, "missing": missing}
+
+
 @router.put("/{id}", response_model=Supplier)
 def update_supplier(
     *,
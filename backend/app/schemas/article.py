@@ -1,7 +1,8 @@
-from typing import Optional
+from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 
+from .batch import BatchMissing
 from .supplier import Supplier
 from .user import User
 
@@ -11,6 +12,7 @@ class ArticleBase(BaseModel):
     description: Optional[str] = None
     price: Optional[float] = None
     supplier_id: Optional[int] = None
+    barcodes: Optional[List[str]] = None
 
 
 # Properties to receive on article creation
@@ -29,6 +31,11 @@ class ArticleInDBBase(ArticleBase):
     id: int
     name: str
     owner_id: int
+    barcodes: List[str] = []
+
+    @validator("barcodes", pre=True)
+    def barcode_codes(cls, value):
+        return [getattr(barcode, "code", barcode) for barcode in value or []]
 
     class Config:
         orm_mode = True
@@ -40,6 +47,31 @@ class Article(ArticleInDBBase):
     supplier: Optional[Supplier] = None
 
 
+# Properties to return for a sparse fetch (`fields`/`expand`): only the
+# requested columns and relationships are present, `id` always
+class ArticleSparse(BaseModel):
+    id: int
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = None
+    supplier_id: Optional[int] = None
+    owner_id: Optional[int] = None
+    owner: Optional[User] = None
+    supplier: Optional[Supplier] = None
+
+
 # Properties stored in DB
 class ArticleInDB(ArticleInDBBase):
     pass
+
+
+# Properties to return on a batch fetch
+class ArticleBatch(BatchMissing):
+    items: List[Article]
+
+
+# Properties to return as a typeahead suggestion
+class ArticleSuggestion(BaseModel):
+    id: int
+    name: str
+    score: float
@@ -0,0 +1,13 @@
+from typing import List
+
+from pydantic import BaseModel, conlist
+
+
+# Properties to receive on a batch fetch by id
+class BatchGet(BaseModel):
+    ids: conlist(int, min_items=1, max_items=10000)
+
+
+# Ids of a batch fetch that did not resolve to an accessible row
+class BatchMissing(BaseModel):
+    missing: List[int] = []
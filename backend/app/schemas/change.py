@@ -0,0 +1,23 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from .article import Article
+from .supplier import Supplier
+
+
+# A single entry of the change feed; `article`/`supplier` is unset for deletes
+class Change(BaseModel):
+    seq: int
+    entity: str
+    id: int
+    deleted: bool = False
+    article: Optional[Article] = None
+    supplier: Optional[Supplier] = None
+
+
+# A page of the change feed, continue with `since=last_seq` while `has_more`
+class ChangeFeed(BaseModel):
+    changes: List[Change]
+    last_seq: int
+    has_more: bool
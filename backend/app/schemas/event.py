@@ -0,0 +1,12 @@
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+
+# A catalog event as pushed to live subscribers; `id` is the change sequence
+class Event(BaseModel):
+    id: int
+    type: str
+    owner_id: Optional[int] = None
+    supplier_id: Optional[int] = None
+    data: Optional[Dict[str, Any]] = None
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+
+# Properties to return on a barcode scan
+class ScanResult(BaseModel):
+    code: str
+    id: int
+    name: str
+    price: float
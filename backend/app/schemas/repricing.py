@@ -0,0 +1,60 @@
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, validator
+
+
+def _not_negative(value: Optional[float]) -> Optional[float]:
+    # rules only ever raise prices
+    if value is not None and value < 0:
+        raise ValueError("must not be negative")
+    return value
+
+
+# Rule values that can be set per supplier
+class RepricingOverride(BaseModel):
+    markup_percent: Optional[float] = None
+    min_margin: Optional[float] = None
+
+    _check_not_negative = validator(
+        "markup_percent", "min_margin", allow_reuse=True
+    )(_not_negative)
+
+
+# Properties to receive on a repricing run
+class RepricingRules(BaseModel):
+    # suppliers whose articles are repriced, all articles if not set
+    supplier_ids: Optional[List[int]] = None
+    markup_percent: float = 0.0
+    # minimum amount a price is raised by
+    min_margin: float = 0.0
+    # round up to this ending, e.g. 0.99 for x.99 prices
+    price_ending: Optional[float] = None
+    overrides: Dict[int, RepricingOverride] = {}
+
+    _check_not_negative = validator(
+        "markup_percent", "min_margin", allow_reuse=True
+    )(_not_negative)
+
+    @validator("price_ending")
+    def check_price_ending(cls, value: Optional[float]) -> Optional[float]:
+        if value is not None and not 0 <= value < 1:
+            raise ValueError("must be at least 0 and below 1")
+        return value
+
+
+class PriceChange(BaseModel):
+    id: int
+    supplier_id: Optional[int] = None
+    old_price: float
+    new_price: float
+
+
+# Properties to return on a repricing preview or run
+class RepricingResult(BaseModel):
+    matched: int
+    changed: int
+    # articles whose price changed while the run evaluated them, not repriced
+    conflicts: List[int] = []
+    total_before: float
+    total_after: float
+    changes: List[PriceChange]
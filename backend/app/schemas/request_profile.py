@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+# Properties to return to client
+class RequestProfile(BaseModel):
+    id: int
+    created_at: datetime
+    method: str
+    path: str
+    status_code: Optional[int]
+    duration: float
+    interval: float
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,53 @@
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, List, Optional
+
+from pydantic import BaseModel, conint, conlist
+
+
+# Properties to receive per line on sale creation
+class SaleLineCreate(BaseModel):
+    article_id: int
+    quantity: conint(gt=0) = 1
+    # the article's current price if not set
+    unit_price: Optional[float] = None
+
+
+# Properties to receive on sale creation
+class SaleCreate(BaseModel):
+    lines: conlist(SaleLineCreate, min_items=1)
+
+
+class SaleLine(BaseModel):
+    article_id: int
+    quantity: int
+    unit_price: float
+    amount: float
+
+
+# Properties to return to client
+class Sale(BaseModel):
+    sale_id: str
+    sold_at: datetime
+    total: float
+    lines: List[SaleLine]
+
+
+class ReportGrouping(str, Enum):
+    day = "day"
+    article = "article"
+    supplier = "supplier"
+
+
+class SalesReportRow(BaseModel):
+    # the day, article id or supplier id (0 for no supplier)
+    key: Any
+    revenue: float
+    quantity: int
+
+
+class SalesReport(BaseModel):
+    group_by: ReportGrouping
+    start: date
+    end: date
+    rows: List[SalesReportRow]
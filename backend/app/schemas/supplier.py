@@ -1,7 +1,9 @@
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel
 
+from .batch import BatchMissing
+
 
 # Shared properties
 class SupplierBase(BaseModel):
@@ -35,3 +37,8 @@ class Supplier(SupplierInDBBase):
 # Properties stored in DB
 class SupplierInDB(SupplierInDBBase):
     pass
+
+
+# Properties to return on a batch fetch
+class SupplierBatch(BatchMissing):
+    items: List[Supplier]
@@ -0,0 +1,120 @@
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.cache import cache_sync
+from app.models.article import Article
+from app.models.barcode import Barcode
+
+# Article ids per query when loading, like GET_MANY_CHUNK_SIZE of the CRUD
+# objects, which import this module
+LOAD_CHUNK_SIZE = 500
+# (article id, name, price, owner id)
+ScanEntry = Tuple[int, str, float, Optional[int]]
+
+
+class BarcodeIndex:
+    def __init__(self):
+        """
+        In-memory hash map of barcode -> article for POS scans.
+
+        The snapshot is loaded once, by the first scan, and kept current by
+        article writes (`put`/`invalidate`) rather than rebuilt. Writes made
+        while it loads are replayed onto it. A code that is not in the map is
+        looked up in the database once and added.
+        """
+        self._entries: Dict[str, ScanEntry] = {}
+        self._codes: Dict[int, List[str]] = {}
+        self._loaded = False
+        # article id -> (codes, entry) of the writes made during a load
+        self._pending: Optional[Dict[int, Tuple[Sequence[str], Any]]] = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def load(self, db: Session) -> None:
+        with self._lock:
+            self._pending = {}
+        # two queries instead of a join, articles may live on other shards
+        codes: Dict[int, List[str]] = {}
+        for code, article_id in db.execute(select(Barcode.code, Barcode.article_id)):
+            codes.setdefault(article_id, []).append(code)
+        # only the articles that have barcodes
+        ids = list(codes)
+        entries = {}
+        for start in range(0, len(ids), LOAD_CHUNK_SIZE):
+            articles = db.execute(
+                select(Article.id, Article.name, Article.price, Article.owner_id).where(
+                    Article.id.in_(ids[start : start + LOAD_CHUNK_SIZE])
+                )
+            )
+            for entry in articles:
+                for code in codes[entry[0]]:
+                    entries[code] = tuple(entry)
+        with self._lock:
+            if self._pending is None:
+                # cleared while loading
+                return
+            self._entries = entries
+            self._codes = codes
+            for article_id, (article_codes, entry) in self._pending.items():
+                self._put(article_id, article_codes, entry)
+            self._pending = None
+            self._loaded = True
+
+    def lookup(self, db: Session, code: str) -> Optional[ScanEntry]:
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self.load(db)
+        cache_sync.poll(db)
+        entry = self._entries.get(code)
+        if entry is not None:
+            return entry
+        article_id = (
+            db.query(Barcode.article_id).filter(Barcode.code == code).scalar()
+        )
+        if article_id is None:
+            return None
+        row = (
+            db.query(Article.id, Article.name, Article.price, Article.owner_id)
+            .filter(Article.id == article_id)
+            .first()
+        )
+        if row is None:
+            return None
+        codes = db.query(Barcode.code).filter(Barcode.article_id == article_id)
+        self.put(article_id, [c for (c,) in codes], tuple(row))
+        return tuple(row)
+
+    def _put(self, article_id: int, codes: Sequence[str], entry: Any) -> None:
+        for code in self._codes.pop(article_id, ()):
+            self._entries.pop(code, None)
+        if codes:
+            self._codes[article_id] = list(codes)
+            for code in codes:
+                self._entries[code] = entry
+
+    def put(self, article_id: int, codes: Sequence[str], entry: ScanEntry) -> None:
+        with self._lock:
+            self._put(article_id, codes, entry)
+            if self._pending is not None:
+                self._pending[article_id] = (codes, entry)
+
+    def invalidate(self, article_id: int) -> None:
+        with self._lock:
+            self._put(article_id, (), None)
+            if self._pending is not None:
+                self._pending[article_id] = ((), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = {}
+            self._codes = {}
+            self._pending = None
+            self._loaded = False
+
+
+barcode_index = BarcodeIndex()
+cache_sync.register("article", barcode_index)
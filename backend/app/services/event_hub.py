@@ -0,0 +1,110 @@
+import asyncio
+import threading
+from collections import deque
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.db.transaction import on_commit
+from app.schemas.event import Event
+
+
+class Subscriber:
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        queue_size: int,
+        owner_id: Optional[int] = None,
+        supplier_id: Optional[int] = None,
+    ):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.owner_id = owner_id
+        self.supplier_id = supplier_id
+        self.dropped = False
+
+    def matches(self, event: Event) -> bool:
+        if event.type == "resync":
+            return True
+        if self.owner_id is not None and event.owner_id != self.owner_id:
+            return False
+        if self.supplier_id is not None and event.supplier_id != self.supplier_id:
+            return False
+        return True
+
+    def _put(self, event: Optional[Event]) -> None:
+        # runs on the subscriber's event loop
+        if self.dropped:
+            return
+        if self.queue.full():
+            self.dropped = True
+            self.queue.get_nowait()
+            event = None
+        self.queue.put_nowait(event)
+
+
+class EventHub:
+    def __init__(self, buffer_size: int = 1000, queue_size: int = 100):
+        """
+        In-process broadcast of catalog events to live subscribers.
+
+        Writers never wait on subscribers: a subscriber whose queue is full is
+        dropped and receives `None`, after which it should reconnect and
+        replay from the ring buffer of the last `buffer_size` events.
+        """
+        self.buffer_size = buffer_size
+        self.queue_size = queue_size
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.Lock()
+
+    def subscribe(
+        self, *, owner_id: Optional[int] = None, supplier_id: Optional[int] = None
+    ) -> Subscriber:
+        subscriber = Subscriber(
+            asyncio.get_running_loop(),
+            self.queue_size,
+            owner_id=owner_id,
+            supplier_id=supplier_id,
+        )
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def replay(
+        self, subscriber: Subscriber, last_event_id: int
+    ) -> Optional[List[Event]]:
+        """
+        Buffered events after `last_event_id` for the subscriber, or `None` if
+        the buffer no longer reaches back that far.
+        """
+        with self._lock:
+            buffered = list(self._buffer)
+        if buffered and buffered[0].id > last_event_id + 1:
+            return None
+        return [
+            e for e in buffered if e.id > last_event_id and subscriber.matches(e)
+        ]
+
+    def publish(self, events: List[Event]) -> None:
+        with self._lock:
+            self._buffer.extend(events)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            for e in events:
+                if subscriber.matches(e):
+                    subscriber.loop.call_soon_threadsafe(subscriber._put, e)
+
+    def queue(self, db: Session, event: Event) -> None:
+        """
+        Publish `event` once the session's transaction is committed.
+        """
+        on_commit(db, lambda: self.publish([event]))
+
+
+event_hub = EventHub()
@@ -0,0 +1,142 @@
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from types import CodeType, FrameType
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Set, Tuple
+
+# Longest sys.path entry first, so frames are named by their import path
+_PATH_PREFIXES = sorted(
+    (os.path.join(os.path.abspath(path), "") for path in sys.path if path),
+    key=len,
+    reverse=True,
+)
+_names: Dict[CodeType, str] = {}
+
+
+def frame_name(code: CodeType) -> str:
+    name = _names.get(code)
+    if name is None:
+        filename = code.co_filename
+        for prefix in _PATH_PREFIXES:
+            if filename.startswith(prefix):
+                filename = filename[len(prefix) :]
+                break
+        name = _names[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+    return name
+
+
+class Sampler:
+    def __init__(self, interval: float, root: FrameType, codes: FrozenSet[CodeType]):
+        """
+        Samples the stacks of one request from a background thread.
+
+        On the calling thread, the event loop, a stack belongs to the request
+        while `root`, the frame of its handler coroutine, is on it. Worker
+        threads are shared with concurrent requests, so only those inside
+        `thread()` for this request are sampled; their stacks belong to it
+        below the outermost frame of a function in `codes`, which marks them.
+        The sampler's own `stop` is left out.
+        """
+        self.interval = interval
+        self.root = root
+        self.codes = codes
+        self.threads: Set[int] = set()
+        self.loop_thread = threading.get_ident()
+        self.counts: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    @contextmanager
+    def thread(self) -> Iterator[None]:
+        """
+        Sample the calling worker thread while the block runs.
+        """
+        ident = threading.get_ident()
+        self.threads.add(ident)
+        try:
+            yield
+        finally:
+            self.threads.discard(ident)
+
+    def stop(self) -> str:
+        """
+        Stop sampling, returns the samples as collapsed stacks.
+        """
+        self._stopped.set()
+        self._thread.join()
+        return "\n".join(
+            f"{';'.join(stack)} {count}" for stack, count in self.counts.items()
+        )
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = self._stack(ident, frame)
+                if stack is not None:
+                    self.counts[stack] += 1
+
+    def _stack(self, ident: int, frame: FrameType) -> Optional[Tuple[str, ...]]:
+        if ident != self.loop_thread and ident not in self.threads:
+            return None
+        frames: List[FrameType] = []
+        outermost = None
+        while frame is not None:
+            if frame.f_code is _STOP_CODE:
+                return None
+            if ident == self.loop_thread:
+                frames.append(frame)
+                if frame is self.root:
+                    outermost = len(frames)
+                    break
+            elif frame.f_code in self.codes:
+                outermost = len(frames)
+            else:
+                frames.append(frame)
+            frame = frame.f_back
+        if outermost is None:
+            return None
+        thread = "event loop" if ident == self.loop_thread else "worker thread"
+        names = [frame_name(frame.f_code) for frame in frames[:outermost]]
+        return (thread, *reversed(names))
+
+
+_STOP_CODE = Sampler.stop.__code__
+
+
+def speedscope(name: str, stacks: str, interval: float) -> Dict[str, Any]:
+    """
+    Convert collapsed stacks to a speedscope sampled profile in milliseconds.
+    """
+    frames: Dict[str, int] = {}
+    samples: List[List[int]] = []
+    weights: List[float] = []
+    for line in stacks.splitlines():
+        stack, _, count = line.rpartition(" ")
+        samples.append(
+            [frames.setdefault(frame, len(frames)) for frame in stack.split(";")]
+        )
+        weights.append(int(count) * interval * 1000)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "shared": {"frames": [{"name": frame} for frame in frames]},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }
+        ],
+    }
@@ -0,0 +1,241 @@
+from functools import partial
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.crud.article import ARTICLE_FIELDS
+from app.crud.base import GET_MANY_CHUNK_SIZE
+from app.db.transaction import on_commit
+from app.models.article import Article
+from app.models.barcode import Barcode
+from app.models.change import Change
+from app.schemas.article import ArticleInDBBase
+from app.schemas.event import Event
+from app.schemas.repricing import RepricingResult, RepricingRules
+from app.services.barcode_index import barcode_index
+from app.services.event_hub import event_hub
+
+# Rows per UPDATE statement when applying new prices
+UPDATE_CHUNK_SIZE = 10000
+
+
+class RepricingService:
+    def _load(
+        self, db: Session, rules: RepricingRules
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        statement = select(
+            Article.id, Article.price, Article.supplier_id, Article.owner_id
+        ).order_by(Article.id)
+        if rules.supplier_ids is not None:
+            statement = statement.where(Article.supplier_id.in_(rules.supplier_ids))
+        rows = db.execute(statement).all()
+        ids, prices, suppliers, owners = zip(*rows) if rows else ((), (), (), ())
+        return (
+            np.fromiter(ids, dtype=np.int64, count=len(rows)),
+            np.fromiter(prices, dtype=np.float64, count=len(rows)),
+            # articles without supplier or owner get -1
+            np.fromiter(
+                (-1 if s is None else s for s in suppliers), np.int64, len(rows)
+            ),
+            np.fromiter((-1 if o is None else o for o in owners), np.int64, len(rows)),
+        )
+
+    def evaluate(
+        self, rules: RepricingRules, prices: np.ndarray, suppliers: np.ndarray
+    ) -> np.ndarray:
+        """
+        New prices for all articles at once.
+
+        A price is raised by `markup_percent` but at least by `min_margin`, both
+        overridable per supplier, then rounded up to `price_ending` and to cents.
+        """
+        markup = np.full(prices.shape, rules.markup_percent)
+        min_margin = np.full(prices.shape, rules.min_margin)
+        for supplier_id, override in rules.overrides.items():
+            mask = suppliers == supplier_id
+            if override.markup_percent is not None:
+                markup[mask] = override.markup_percent
+            if override.min_margin is not None:
+                min_margin[mask] = override.min_margin
+        new_prices = np.maximum(prices * (1 + markup / 100), prices + min_margin)
+        if rules.price_ending is not None:
+            # round before ceil so that 10.99 - 0.99 doesn't become 10.0000001
+            whole = np.ceil(np.round(new_prices - rules.price_ending, 6))
+            new_prices = whole + rules.price_ending
+        return np.round(new_prices, 2)
+
+    def _result(
+        self,
+        ids: np.ndarray,
+        prices: np.ndarray,
+        suppliers: np.ndarray,
+        new_prices: np.ndarray,
+        changed: np.ndarray,
+        limit: int,
+        conflicts: Sequence[int] = (),
+    ) -> RepricingResult:
+        shown = np.flatnonzero(changed)[:limit]
+        return RepricingResult(
+            conflicts=list(conflicts),
+            matched=len(ids),
+            changed=int(changed.sum()),
+            total_before=float(prices.sum()),
+            total_after=float(new_prices.sum()),
+            changes=[
+                {
+                    "id": int(ids[i]),
+                    "supplier_id": None if suppliers[i] < 0 else int(suppliers[i]),
+                    "old_price": float(prices[i]),
+                    "new_price": float(new_prices[i]),
+                }
+                for i in shown
+            ],
+        )
+
+    def preview(
+        self, db: Session, *, rules: RepricingRules, limit: int = 100
+    ) -> RepricingResult:
+        """
+        Evaluate the rules without writing; `changes` lists the first `limit`
+        price changes.
+        """
+        ids, prices, suppliers, _ = self._load(db, rules)
+        new_prices = self.evaluate(rules, prices, suppliers)
+        changed = np.abs(new_prices - prices) >= 0.005
+        return self._result(ids, prices, suppliers, new_prices, changed, limit)
+
+    def apply(
+        self, db: Session, *, rules: RepricingRules, limit: int = 100
+    ) -> RepricingResult:
+        """
+        Evaluate the rules and write the changed prices with chunked bulk
+        UPDATEs in a single transaction.
+
+        A price is only written while it is still the one the rules were
+        evaluated on; articles whose price changed concurrently are left as
+        they are and listed in `conflicts`.
+        """
+        ids, prices, suppliers, owners = self._load(db, rules)
+        new_prices = self.evaluate(rules, prices, suppliers)
+        changed = np.abs(new_prices - prices) >= 0.005
+        conflicts = self._write(
+            db, ids[changed].tolist(), prices[changed].tolist(), new_prices[changed]
+        )
+        if conflicts:
+            changed &= ~np.isin(ids, conflicts)
+        changed_ids = ids[changed].tolist()
+        changed_owners = [None if o < 0 else o for o in owners[changed].tolist()]
+
+        last_seq = db.query(func.max(Change.seq)).scalar()
+        crud.change.record_many(
+            db, entity="article", rows=list(zip(changed_ids, changed_owners))
+        )
+        self._queue_events(db, last_seq or 0, len(changed_ids))
+        on_commit(db, crud.article.cache.clear)
+        on_commit(db, partial(self._invalidate_scans, changed_ids))
+        db.commit()
+        return self._result(
+            ids, prices, suppliers, new_prices, changed, limit, conflicts
+        )
+
+    def _write(
+        self,
+        db: Session,
+        ids: List[int],
+        old_prices: List[float],
+        new_prices: np.ndarray,
+    ) -> List[int]:
+        """
+        Write the new prices of articles whose price is still the old one,
+        returns the ids of the others.
+        """
+        statement = (
+            update(Article)
+            .where(
+                Article.id == bindparam("article_id"),
+                Article.price == bindparam("old_price"),
+            )
+            .values(price=bindparam("new_price"))
+            .execution_options(synchronize_session=False)
+        )
+        new_prices_list = new_prices.tolist()
+        conflicts = []
+        for start in range(0, len(ids), UPDATE_CHUNK_SIZE):
+            stop = start + UPDATE_CHUNK_SIZE
+            chunk = ids[start:stop]
+            result = db.execute(
+                statement,
+                [
+                    {"article_id": id, "old_price": old, "new_price": new}
+                    for id, old, new in zip(
+                        chunk, old_prices[start:stop], new_prices_list[start:stop]
+                    )
+                ],
+            )
+            if result.rowcount == len(chunk):
+                continue
+            # some rows didn't match: changed or deleted since they were read
+            current = {}
+            for sub in range(0, len(chunk), GET_MANY_CHUNK_SIZE):
+                current.update(
+                    db.execute(
+                        select(Article.id, Article.price).where(
+                            Article.id.in_(chunk[sub : sub + GET_MANY_CHUNK_SIZE])
+                        )
+                    ).all()
+                )
+            conflicts += [
+                id
+                for id, new in zip(chunk, new_prices_list[start:stop])
+                if current.get(id) != new
+            ]
+        return sorted(conflicts)
+
+    def _invalidate_scans(self, ids: Sequence[int]) -> None:
+        for id in ids:
+            barcode_index.invalidate(id)
+
+    def _queue_events(self, db: Session, since: int, count: int) -> None:
+        if not count:
+            return
+        if count > event_hub.buffer_size:
+            # too many to stream, subscribers catch up through the change feed
+            last_seq = db.query(func.max(Change.seq)).scalar()
+            event_hub.queue(db, Event(id=last_seq, type="resync"))
+            return
+        seqs = dict(
+            db.query(Change.entity_id, Change.seq).filter(
+                Change.seq > since, Change.entity == "article"
+            )
+        )
+        columns = [getattr(Article, field) for field in ARTICLE_FIELDS]
+        ids = sorted(seqs, key=seqs.get)
+        for start in range(0, len(ids), GET_MANY_CHUNK_SIZE):
+            chunk = ids[start : start + GET_MANY_CHUNK_SIZE]
+            rows = db.execute(select(*columns).where(Article.id.in_(chunk)))
+            barcodes: Dict[int, List[str]] = {}
+            for article_id, code in db.execute(
+                select(Barcode.article_id, Barcode.code)
+                .where(Barcode.article_id.in_(chunk))
+                .order_by(Barcode.id)
+            ):
+                barcodes.setdefault(article_id, []).append(code)
+            for row in sorted(rows.mappings(), key=lambda row: seqs[row["id"]]):
+                event_hub.queue(
+                    db,
+                    Event(
+                        id=seqs[row["id"]],
+                        type="article.updated",
+                        owner_id=row["owner_id"],
+                        supplier_id=row["supplier_id"],
+                        data=ArticleInDBBase(
+                            **row, barcodes=barcodes.get(row["id"], [])
+                        ).dict(),
+                    ),
+                )
+
+
+repricing_service = RepricingService()
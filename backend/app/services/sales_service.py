@@ -0,0 +1,58 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.schemas.sale import SaleCreate
+
+
+class SalesService:
+    def record_sale(
+        self, db: Session, *, obj_in: SaleCreate, owner_id: Optional[int] = None
+    ) -> dict:
+        """
+        Record a sale in the ledger.
+
+        Lines without a unit price are sold at the article's current price.
+        With `owner_id` only that owner's articles can be sold; a `ValueError`
+        names the articles that can't.
+        """
+        ids = [line.article_id for line in obj_in.lines]
+        if owner_id is None:
+            articles = crud.article.get_many(db, ids)
+        else:
+            articles = crud.article.get_many_by_owner(db, ids, owner_id=owner_id)
+        by_id = {article.id: article for article in articles}
+        missing = [id for id in dict.fromkeys(ids) if id not in by_id]
+        if missing:
+            raise ValueError(f"Unknown articles: {', '.join(map(str, missing))}")
+
+        lines = []
+        for line in obj_in.lines:
+            article = by_id[line.article_id]
+            unit_price = article.price if line.unit_price is None else line.unit_price
+            lines.append(
+                {
+                    "owner_id": article.owner_id,
+                    "article_id": article.id,
+                    "supplier_id": article.supplier_id,
+                    "quantity": line.quantity,
+                    "unit_price": unit_price,
+                    "amount": round(unit_price * line.quantity, 2),
+                }
+            )
+        sale_id = uuid.uuid4().hex
+        sold_at = datetime.utcnow()
+        crud.sale.record(db, sale_id=sale_id, sold_at=sold_at, lines=lines)
+        db.commit()
+        return {
+            "sale_id": sale_id,
+            "sold_at": sold_at,
+            "total": round(sum(line["amount"] for line in lines), 2),
+            "lines": lines,
+        }
+
+
+sales_service = SalesService()
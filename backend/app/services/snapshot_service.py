@@ -0,0 +1,184 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+from contextlib import ExitStack
+from datetime import datetime
+from typing import IO, Any, Dict, Iterator, List, Union
+
+from sqlalchemy import Table, create_engine, func, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.models.article import Article
+from app.models.article_count import ArticleCount
+from app.models.barcode import Barcode
+from app.models.change import Change
+from app.models.supplier import Supplier
+from app.models.user import User
+
+SNAPSHOT_FORMAT = "warenwelt-snapshot"
+SNAPSHOT_VERSION = 1
+# Catalog tables in the snapshot, in the order they are restored
+SNAPSHOT_TABLES = (
+    User.__table__,
+    Supplier.__table__,
+    Article.__table__,
+    Barcode.__table__,
+)
+# Rows per columnar chunk
+SNAPSHOT_CHUNK_SIZE = 10000
+
+
+class SnapshotService:
+    def _reader(
+        self, stack: ExitStack, bind: Union[Engine, Connection], directory: str
+    ) -> Connection:
+        """
+        A connection that sees one point in time of `bind`'s database: an
+        online backup for SQLite, a repeatable read transaction otherwise.
+        A session bound to a connection is read through that connection's
+        transaction; SQLite can't back up a connection in a write.
+        """
+        if isinstance(bind, Connection):
+            return bind
+        conn = stack.enter_context(bind.connect())
+        if bind.dialect.name != "sqlite":
+            conn = conn.execution_options(isolation_level="REPEATABLE READ")
+            stack.enter_context(conn.begin())
+            return conn
+        path = os.path.join(directory, f"copy-{len(os.listdir(directory))}.db")
+        target = sqlite3.connect(path)
+        try:
+            conn.connection.dbapi_connection.backup(target)
+        finally:
+            target.close()
+        copy = create_engine(f"sqlite:///{path}")
+        stack.callback(copy.dispose)
+        return stack.enter_context(copy.connect())
+
+    def _chunks(self, conn: Connection, table: Table) -> Iterator[List[Any]]:
+        rows = conn.execute(select(table).order_by(*table.primary_key.columns))
+        while True:
+            chunk = rows.fetchmany(SNAPSHOT_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def _write_line(self, out: IO[bytes], digest: Any, data: dict) -> None:
+        line = json.dumps(data, separators=(",", ":")).encode() + b"\n"
+        digest.update(line)
+        out.write(line)
+
+    def write(self, db: Session, fileobj: IO[bytes]) -> Dict[str, Any]:
+        """
+        Write a gzip compressed snapshot of the catalog tables to `fileobj`.
+
+        The snapshot is newline delimited JSON: a header with the change feed
+        sequence number it corresponds to, columnar chunks of rows per table
+        and a trailer with the row counts and the sha256 of all lines before
+        it. Returns the trailer.
+
+        With article shards every database is copied on its own, the default
+        database first. A client catching up from the snapshot's `seq` may see
+        changes that are already in the snapshot again, never miss one.
+        """
+        router = db.info.get("shard_router")
+        digest = hashlib.sha256()
+        rows: Dict[str, int] = {}
+        with ExitStack() as stack:
+            directory = stack.enter_context(tempfile.TemporaryDirectory())
+            default = self._reader(
+                stack,
+                router.default_engine if router is not None else db.get_bind(),
+                directory,
+            )
+            seq = default.execute(select(func.max(Change.seq))).scalar() or 0
+            readers = {table.name: [default] for table in SNAPSHOT_TABLES}
+            if router is not None:
+                readers[Article.__tablename__] = [
+                    self._reader(stack, router.shard_engines[name], directory)
+                    for name in router.shard_names
+                ]
+
+            with gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=6) as out:
+                header = {
+                    "format": SNAPSHOT_FORMAT,
+                    "version": SNAPSHOT_VERSION,
+                    "seq": seq,
+                    "created_at": datetime.utcnow().isoformat(),
+                    "tables": {
+                        table.name: [column.name for column in table.columns]
+                        for table in SNAPSHOT_TABLES
+                    },
+                }
+                self._write_line(out, digest, header)
+                for table in SNAPSHOT_TABLES:
+                    rows[table.name] = 0
+                    for conn in readers[table.name]:
+                        for chunk in self._chunks(conn, table):
+                            columns = {
+                                column.name: [row[i] for row in chunk]
+                                for i, column in enumerate(table.columns)
+                            }
+                            self._write_line(
+                                out, digest, {"table": table.name, "columns": columns}
+                            )
+                            rows[table.name] += len(chunk)
+                trailer = {"rows": rows, "sha256": digest.hexdigest(), "seq": seq}
+                # not part of its own checksum
+                out.write(json.dumps(trailer).encode() + b"\n")
+        return trailer
+
+    def restore(self, conn: Connection, fileobj: IO[bytes]) -> Dict[str, Any]:
+        """
+        Replace the catalog tables behind `conn` with a snapshot read from
+        `fileobj`, in the caller's transaction.
+
+        Raises `ValueError` for a snapshot that is not complete or does not
+        match its checksum; the caller must then roll back. The change feed
+        and the article counters of the target are dropped, they describe
+        the replaced rows.
+        """
+        tables = {table.name: table for table in SNAPSHOT_TABLES}
+        digest = hashlib.sha256()
+        rows = {name: 0 for name in tables}
+        header = trailer = None
+        with gzip.GzipFile(fileobj=fileobj, mode="rb") as snapshot:
+            for line in snapshot:
+                data = json.loads(line)
+                if header is None:
+                    if data.get("format") != SNAPSHOT_FORMAT:
+                        raise ValueError("Not a snapshot")
+                    if data.get("version") != SNAPSHOT_VERSION:
+                        raise ValueError(
+                            f"Unsupported snapshot version: {data.get('version')}"
+                        )
+                    header = data
+                    digest.update(line)
+                    for table in reversed(SNAPSHOT_TABLES):
+                        conn.execute(table.delete())
+                    conn.execute(Change.__table__.delete())
+                    conn.execute(ArticleCount.__table__.delete())
+                elif "table" in data:
+                    digest.update(line)
+                    columns = data["columns"]
+                    values = [
+                        dict(zip(columns, row)) for row in zip(*columns.values())
+                    ]
+                    if values:
+                        conn.execute(tables[data["table"]].insert(), values)
+                    rows[data["table"]] += len(values)
+                else:
+                    trailer = data
+                    break
+        if trailer is None:
+            raise ValueError("Snapshot is incomplete")
+        if trailer["sha256"] != digest.hexdigest() or trailer["rows"] != rows:
+            raise ValueError("Snapshot does not match its checksum")
+        return trailer
+
+
+snapshot_service = SnapshotService()
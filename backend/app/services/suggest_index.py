@@ -0,0 +1,302 @@
+import heapq
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.db.cache import cache_sync
+from app.models.article import Article
+from app.models.sale import SalesArticleDay
+
+# Most suggestions a single request can ask for
+SUGGEST_MAX_LIMIT = 50
+# Prefixes whose top suggestions are remembered per owner, only prefixes
+# matching more names than SUGGEST_MEMO_MIN_RANGE are worth it
+SUGGEST_MEMO_SIZE = 4096
+SUGGEST_MEMO_MIN_RANGE = 256
+
+# (article id, name, popularity score)
+Suggestion = Tuple[int, str, float]
+# A write made while an index loads, replayed onto it: ("put", id, owner,
+# name), ("remove", id, None, None) or ("score", id, delta, None)
+_Write = Tuple[str, int, Any, Optional[str]]
+
+
+def normalize(name: str) -> str:
+    """
+    Case folded name without accents and with single spaces, so "Käse  "
+    and "kase" share their prefixes.
+    """
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.split())
+
+
+class _OwnerIndex:
+    def __init__(self, names: Dict[int, str], scores: Dict[int, float]):
+        # "<normalized name>\0<id>" sorts by name, is unique per article and
+        # still starts with the normalized name; `ids` runs parallel to it
+        self.names = names
+        self.scores = scores
+        self.keys: Dict[int, str] = {
+            id: f"{normalize(name)}\0{id}" for id, name in names.items()
+        }
+        entries = sorted((key, id) for id, key in self.keys.items())
+        self.sorted_keys: List[str] = [key for key, _ in entries]
+        self.ids: List[int] = [id for _, id in entries]
+        self.memo: "OrderedDict[str, List[Suggestion]]" = OrderedDict()
+
+    def forget(self, key: str) -> None:
+        # every memoized prefix of the name may now rank differently
+        name = key[: key.index("\0")]
+        for end in range(1, len(name) + 1):
+            self.memo.pop(name[:end], None)
+
+    def _insert(self, key: str, article_id: int) -> None:
+        position = bisect_left(self.sorted_keys, key)
+        self.sorted_keys.insert(position, key)
+        self.ids.insert(position, article_id)
+        self.keys[article_id] = key
+        self.forget(key)
+
+    def _delete(self, article_id: int) -> None:
+        key = self.keys.pop(article_id)
+        position = bisect_left(self.sorted_keys, key)
+        del self.sorted_keys[position]
+        del self.ids[position]
+        self.forget(key)
+
+    def put(self, article_id: int, name: str) -> None:
+        if article_id in self.keys:
+            self._delete(article_id)
+        self._insert(f"{normalize(name)}\0{article_id}", article_id)
+        self.names[article_id] = name
+
+    def remove(self, article_id: int) -> None:
+        if article_id in self.keys:
+            self._delete(article_id)
+            self.names.pop(article_id, None)
+            self.scores.pop(article_id, None)
+
+    def add_score(self, article_id: int, delta: float) -> None:
+        key = self.keys.get(article_id)
+        if key is not None:
+            self.scores[article_id] = self.scores.get(article_id, 0.0) + delta
+            self.forget(key)
+
+    def top(self, prefix: str) -> List[Suggestion]:
+        suggestions = self.memo.get(prefix)
+        if suggestions is not None:
+            self.memo.move_to_end(prefix)
+            return suggestions
+        start = bisect_left(self.sorted_keys, prefix)
+        # "\U0010ffff" sorts after every character a name can continue with
+        end = bisect_left(self.sorted_keys, prefix + "\U0010ffff", start)
+        scores = self.scores
+        # most popular first; nsmallest is stable, so ties stay in name order
+        best = heapq.nsmallest(
+            SUGGEST_MAX_LIMIT,
+            self.ids[start:end],
+            key=lambda id: -scores.get(id, 0.0),
+        )
+        suggestions = [(id, self.names[id], scores.get(id, 0.0)) for id in best]
+        if end - start > SUGGEST_MEMO_MIN_RANGE:
+            self.memo[prefix] = suggestions
+            if len(self.memo) > SUGGEST_MEMO_SIZE:
+                self.memo.popitem(last=False)
+        return suggestions
+
+
+class SuggestIndex:
+    def __init__(self):
+        """
+        In-memory prefix index over normalized article names for typeahead.
+
+        Each owner's articles are kept in a sorted list searched with bisect,
+        loaded on the owner's first request and kept current by article writes
+        and sales (`put`/`remove`/`add_score`). Superusers search one index of
+        all articles, loaded on their first request. Suggestions are ranked by
+        the quantity sold. The top suggestions of prefixes with many matches
+        are memoized until a write touches a name starting with them, so only
+        the first request for a short prefix scans its whole range.
+
+        Writes made while an index loads are replayed onto it. Articles
+        written by other workers are read again before the next suggestion.
+        """
+        self._owners: Dict[int, _OwnerIndex] = {}
+        self._owner_of: Dict[int, int] = {}
+        self._all: Optional[_OwnerIndex] = None
+        self._stale: Set[int] = set()
+        self._journals: List[List[_Write]] = []
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session, owner_id: Optional[int]) -> None:
+        """
+        Load the index of one owner or, without `owner_id`, of all owners.
+        """
+        journal: List[_Write] = []
+        with self._lock:
+            generation = self._generation
+            self._journals.append(journal)
+        try:
+            articles = select(Article.id, Article.name)
+            sold = select(
+                SalesArticleDay.article_id, func.sum(SalesArticleDay.quantity)
+            ).group_by(SalesArticleDay.article_id)
+            if owner_id is not None:
+                articles = articles.where(Article.owner_id == owner_id)
+                sold = sold.where(SalesArticleDay.owner_id == owner_id)
+            names = {id: name for id, name in db.execute(articles)}
+            scores = {id: float(quantity) for id, quantity in db.execute(sold)}
+            index = _OwnerIndex(names, scores)
+        except Exception:
+            with self._lock:
+                if generation == self._generation:
+                    self._journals.remove(journal)
+            raise
+        with self._lock:
+            if generation != self._generation:
+                # cleared while loading
+                return
+            # writes are journaled until the index is installed, under this lock
+            self._journals.remove(journal)
+            for kind, id, value, name in journal:
+                if kind == "put" and (owner_id is None or value == owner_id):
+                    index.put(id, name)
+                elif kind == "score":
+                    index.add_score(id, value)
+                else:
+                    index.remove(id)
+            if owner_id is None:
+                if self._all is None:
+                    self._all = index
+            elif owner_id not in self._owners:
+                self._owners[owner_id] = index
+                self._owner_of.update(dict.fromkeys(index.names, owner_id))
+
+    def _refresh(self, db: Session) -> None:
+        """
+        Read the articles written by other workers again.
+        """
+        with self._lock:
+            stale, self._stale = self._stale, set()
+        if not stale:
+            return
+        rows = db.execute(
+            select(Article.id, Article.name, Article.owner_id).where(
+                Article.id.in_(stale)
+            )
+        ).all()
+        with self._lock:
+            for id, name, owner in rows:
+                self._put(id, owner, name)
+            for id in stale - {id for id, _, _ in rows}:
+                self._remove(id)
+
+    def suggest(
+        self,
+        db: Session,
+        prefix: str,
+        *,
+        owner_id: Optional[int] = None,
+        limit: int = 10,
+    ) -> List[Suggestion]:
+        """
+        The `limit` most popular articles whose normalized name starts with
+        `prefix`, of one owner or, without `owner_id`, of all owners.
+        """
+        cache_sync.poll(db)
+        self._refresh(db)
+        if owner_id is None:
+            if self._all is None:
+                self._load(db, None)
+        elif owner_id not in self._owners:
+            self._load(db, owner_id)
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        limit = min(limit, SUGGEST_MAX_LIMIT)
+        with self._lock:
+            if owner_id is None:
+                index = self._all
+            else:
+                index = self._owners.get(owner_id)
+            return index.top(prefix)[:limit] if index is not None else []
+
+    def _journal(self, write: _Write) -> None:
+        for journal in self._journals:
+            journal.append(write)
+
+    def _put(self, article_id: int, owner_id: Optional[int], name: str) -> None:
+        owner = owner_id or 0
+        self._journal(("put", article_id, owner, name))
+        old_owner = self._owner_of.get(article_id)
+        if old_owner is not None and old_owner != owner:
+            self._owners[old_owner].remove(article_id)
+            del self._owner_of[article_id]
+        index = self._owners.get(owner)
+        if index is not None:
+            index.put(article_id, name)
+            self._owner_of[article_id] = owner
+        if self._all is not None:
+            self._all.put(article_id, name)
+
+    def _remove(self, article_id: int) -> None:
+        self._journal(("remove", article_id, None, None))
+        owner = self._owner_of.pop(article_id, None)
+        if owner is not None:
+            self._owners[owner].remove(article_id)
+        if self._all is not None:
+            self._all.remove(article_id)
+
+    def put(self, article_id: int, owner_id: Optional[int], name: str) -> None:
+        with self._lock:
+            self._put(article_id, owner_id, name)
+
+    def remove(self, article_id: int) -> None:
+        with self._lock:
+            self._remove(article_id)
+
+    def add_score(self, article_id: int, delta: float) -> None:
+        with self._lock:
+            self._journal(("score", article_id, delta, None))
+            owner = self._owner_of.get(article_id)
+            if owner is not None:
+                self._owners[owner].add_score(article_id, delta)
+            if self._all is not None:
+                self._all.add_score(article_id, delta)
+
+    def invalidate(self, article_id: int) -> None:
+        with self._lock:
+            self._stale.add(article_id)
+
+    def invalidate_owned(self, article_id: int, owner_id: Optional[int]) -> None:
+        """
+        Read an article written by another worker again on the next
+        suggestion, if an index it was or is in is loaded.
+        """
+        with self._lock:
+            if (
+                self._all is not None
+                or article_id in self._owner_of
+                or (owner_id or 0) in self._owners
+            ):
+                self._stale.add(article_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._owners = {}
+            self._owner_of = {}
+            self._all = None
+            self._stale = set()
+            self._journals = []
+            self._generation += 1
+
+
+suggest_index = SuggestIndex()
+cache_sync.register("article", suggest_index)
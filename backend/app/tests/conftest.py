@@ -2,19 +2,24 @@ from typing import Generator
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm.session import Session
 
+from app import crud
 from app.db.base import Base
 from app.db.session import SessionLocal
+from app.db.transaction import begin_explicitly
 from app.main import app
 from app.routes import deps
+from app.services.barcode_index import barcode_index
+from app.services.suggest_index import suggest_index
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test_db.db"
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+begin_explicitly(engine)
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -38,14 +43,34 @@ def setup_db():
     Base.metadata.drop_all(bind=engine)
 
 
+@pytest.fixture(scope="function", autouse=True)
+def clear_caches() -> None:
+    """
+    Every test rolls its data back, so nothing cached may outlive it.
+    """
+    crud.article.cache.clear()
+    crud.supplier.cache.clear()
+    barcode_index.clear()
+    suggest_index.clear()
+
+
 @pytest.fixture(scope="function")
 def db_session() -> Generator[Session, None, None]:
     """
-    Creates a new database session for a test.
+    Creates a new database session for a test. Its commits and rollbacks end
+    a savepoint, so a route that rolls back keeps the test's earlier data.
     """
     connection = engine.connect()
     transaction = connection.begin()
     session = TestingSessionLocal(bind=connection)
+    nested = connection.begin_nested()
+
+    @event.listens_for(session, "after_transaction_end")
+    def restart_savepoint(session: Session, ended) -> None:
+        nonlocal nested
+        if not nested.is_active:
+            nested = connection.begin_nested()
+
     yield session
     session.close()
     transaction.rollback()
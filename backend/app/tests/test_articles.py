@@ -1,7 +1,12 @@
+import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
+from app import crud
 from app.core.config import settings
+from app.schemas.article import ArticleCreate
+from app.schemas.supplier import SupplierCreate
 from app.tests.utils.article import create_random_article
 from app.tests.utils.user import create_random_user, get_user_authentication_headers
 
@@ -45,3 +50,296 @@ def test_read_article(client: TestClient, db_session: Session) -> None:
     assert content["price"] == article.price
     assert content["id"] == article.id
     assert content["owner"]["id"] == user.id
+
+
+def test_read_articles_sparse_fields(client: TestClient, db_session: Session) -> None:
+    user_data = create_random_user(db_session)
+    user = user_data["user"]
+    create_random_article(db_session, owner_id=user.id)
+    headers = get_user_authentication_headers(
+        client=client, email=user_data["email"], password=user_data["password"]
+    )
+    response = client.get(
+        f"{settings.API_V1_STR}/articles/?fields=name,price",
+        headers=headers,
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert len(content) == 1
+    assert set(content[0]) == {"id", "name", "price"}
+
+    response = client.get(
+        f"{settings.API_V1_STR}/articles/?fields=name&expand=owner",
+        headers=headers,
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert set(content[0]) == {"id", "name", "owner"}
+    assert content[0]["owner"]["id"] == user.id
+
+    response = client.get(
+        f"{settings.API_V1_STR}/articles/?fields=secret", headers=headers
+    )
+    assert response.status_code == 400
+
+    # empty values return full articles
+    response = client.get(
+        f"{settings.API_V1_STR}/articles/?fields=&expand=", headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()[0]["owner"]["id"] == user.id
+
+    schema = client.get(f"{settings.API_V1_STR}/openapi.json").json()
+    responses = schema["paths"][f"{settings.API_V1_STR}/articles/"]["get"]["responses"]
+    items = responses["200"]["content"]["application/json"]["schema"]["anyOf"]
+    assert [item["items"]["$ref"].rsplit("/", 1)[-1] for item in items] == [
+        "Article",
+        "ArticleSparse",
+    ]
+
+
+def test_read_articles_gzip(client: TestClient, db_session: Session) -> None:
+    user_data = create_random_user(db_session)
+    user = user_data["user"]
+    for _ in range(20):
+        create_random_article(db_session, owner_id=user.id)
+    headers = get_user_authentication_headers(
+        client=client, email=user_data["email"], password=user_data["password"]
+    )
+    headers["Accept-Encoding"] = "gzip"
+    response = client.get(f"{settings.API_V1_STR}/articles/", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 20
+
+
+def test_batch_get_articles(client: TestClient, db_session: Session) -> None:
+    user_data = create_random_user(db_session)
+    user = user_data["user"]
+    other = create_random_user(db_session)["user"]
+    own = [create_random_article(db_session, owner_id=user.id) for _ in range(3)]
+    foreign = create_random_article(db_session, owner_id=other.id)
+    headers = get_user_authentication_headers(
+        client=client, email=user_data["email"], password=user_data["password"]
+    )
+    ids = [own[2].id, own[0].id, foreign.id, own[1].id, 999999]
+    response = client.post(
+        f"{settings.API_V1_STR}/articles/batch-get",
+        headers=headers,
+        json={"ids": ids},
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert [item["id"] for item in content["items"]] == [
+        own[2].id,
+        own[0].id,
+        own[1].id,
+    ]
+    assert content["missing"] == [foreign.id, 999999]
+
+
+def test_get_many_chunked(db_session: Session) -> None:
+    user = create_random_user(db_session)["user"]
+    articles = [create_random_article(db_session, owner_id=user.id) for _ in range(5)]
+    ids = [article.id for article in reversed(articles)]
+    found = crud.article.get_many(db_session, ids + ids[:1], chunk_size=2)
+    assert [article.id for article in found] == ids
+
+
+def test_read_article_changes(client: TestClient, db_session: Session) -> None:
+    user_data = create_random_user(db_session)
+    user = user_data["user"]
+    first = create_random_article(db_session, owner_id=user.id)
+    second = create_random_article(db_session, owner_id=user.id)
+    headers = get_user_authentication_headers(
+        client=client, email=user_data["email"], password=user_data["password"]
+    )
+    response = client.get(
+        f"{settings.API_V1_STR}/articles/changes?since=0", headers=headers
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert [c["id"] for c in content["changes"]] == [first.id, second.id]
+    since = content["last_seq"]
+
+    client.put(
+        f"{settings.API_V1_STR}/articles/{first.id}",
+        headers=headers,
+        json={"price": 12.0},
+    )
+    client.delete(f"{settings.API_V1_STR}/articles/{second.id}", headers=headers)
+    response = client.get(
+        f"{settings.API_V1_STR}/articles/changes?since={since}&limit=1",
+        headers=headers,
+    )
+    content = response.json()
+    assert content["has_more"] is True
+    assert content["changes"][0]["id"] == first.id
+    assert content["changes"][0]["article"]["price"] == 12.0
+
+    response = client.get(
+        f"{settings.API_V1_STR}/articles/changes?since={content['last_seq']}",
+        headers=headers,
+    )
+    content = response.json()
+    assert content["has_more"] is False
+    assert content["changes"] == [
+        {
+            "seq": content["last_seq"],
+            "entity": "article",
+            "id": second.id,
+            "deleted": True,
+            "article": None,
+            "supplier": None,
+        }
+    ]
+
+
+def test_read_articles_total(client: TestClient, db_session: Session) -> None:
+    user_data = create_random_user(db_session)
+    user = user_data["user"]
+    articles = [create_random_article(db_session, owner_id=user.id) for _ in range(3)]
+    headers = get_user_authentication_headers(
+        client=client, email=user_data["email"], password=user_data["password"]
+    )
+    url = f"{settings.API_V1_STR}/articles/?limit=1&total=true"
+    response = client.get(url, headers=headers)
+    assert len(response.json()) == 1
+    assert response.headers["X-Total-Count"] == "3"
+
+    client.delete(f"{settings.API_V1_STR}/articles/{articles[0].id}", headers=headers)
+    response = client.get(f"{url}&fields=name", headers=headers)
+    assert response.headers["X-Total-Count"] == "2"
+    assert crud.article_count.get(db_session, scope="owner", scope_id=user.id) == 2
+
+    crud.article_count.apply(db_session, scope="owner", scope_id=user.id, delta=5)
+    repaired = crud.article_count.reconcile(db_session)
+    assert repaired[("owner", user.id)] == (7, 2)
+    assert crud.article.count(db_session, owner_id=user.id) == 2
+
+
+def test_read_articles_by_supplier(client: TestClient, db_session: Session) -> None:
+    user_data = create_random_user(db_session)
+    user = user_data["user"]
+    other = create_random_user(db_session)["user"]
+    supplier = crud.supplier.create(db_session, obj_in=SupplierCreate(name="acme"))
+    ids = [
+        crud.article.create_with_owner(
+            db_session,
+            obj_in=ArticleCreate(name="a", price=1.0, supplier_id=supplier_id),
+            owner_id=owner.id,
+        ).id
+        for owner, supplier_id in (
+            (user, supplier.id),
+            (user, None),
+            (other, supplier.id),
+            (user, supplier.id),
+        )
+    ]
+    headers = get_user_authentication_headers(
+        client=client, email=user_data["email"], password=user_data["password"]
+    )
+    url = f"{settings.API_V1_STR}/articles/?supplier_id={supplier.id}&total=true"
+    response = client.get(url, headers=headers)
+    assert [a["id"] for a in response.json()] == [ids[0], ids[3]]
+    assert response.headers["X-Total-Count"] == "2"
+    response = client.get(f"{url}&fields=name", headers=headers)
+    assert [a["id"] for a in response.json()] == [ids[0], ids[3]]
+    assert response.headers["X-Total-Count"] == "2"
+
+    # superusers are counted from the supplier's counter
+    user.is_superuser = True
+    db_session.commit()
+    crud.article_count.apply(
+        db_session, scope="supplier", scope_id=supplier.id, delta=1
+    )
+    db_session.commit()
+    response = client.get(f"{url}&limit=1", headers=headers)
+    assert [a["id"] for a in response.json()] == [ids[0]]
+    assert response.headers["X-Total-Count"] == "4"
+
+
+def test_count_total_with_missing_owner_counter(db_session: Session) -> None:
+    users = [create_random_user(db_session)["user"] for _ in range(2)]
+    for user in users:
+        create_random_article(db_session, owner_id=user.id)
+    total = crud.article.count(db_session)
+    # an owner counter dropped by a decrement must not shrink the total
+    crud.article_count.remove(db_session, scope="owner", scope_id=users[0].id)
+    db_session.commit()
+    assert crud.article.count(db_session) == total
+
+    crud.article_count.remove(db_session, scope="total", scope_id=0)
+    db_session.commit()
+    create_random_article(db_session, owner_id=users[1].id)
+    assert crud.article.count(db_session) == total + 1
+    crud.article_count.apply(db_session, scope="total", scope_id=0, delta=3)
+    db_session.commit()
+    repaired = crud.article_count.reconcile(db_session)
+    assert repaired[("total", 0)] == (total + 4, total + 1)
+
+
+def test_read_articles_loads_barcodes_in_bulk(
+    client: TestClient, db_session: Session
+) -> None:
+    user_data = create_random_user(db_session)
+    headers = get_user_authentication_headers(
+        client=client, email=user_data["email"], password=user_data["password"]
+    )
+    statements = []
+    bind = db_session.get_bind()
+
+    def count(*args) -> None:
+        statements.append(args[2])
+
+    def read() -> int:
+        crud.article.cache.clear()
+        db_session.expire_all()
+        statements.clear()
+        event.listen(bind, "before_cursor_execute", count)
+        try:
+            response = client.get(f"{settings.API_V1_STR}/articles/", headers=headers)
+        finally:
+            event.remove(bind, "before_cursor_execute", count)
+        assert response.status_code == 200
+        return len(statements)
+
+    for i in range(5):
+        crud.article.create_with_owner(
+            db_session,
+            obj_in=ArticleCreate(name=f"Bulk {i}", price=1.0, barcodes=[f"bulk-{i}"]),
+            owner_id=user_data["user"].id,
+        )
+        if i == 0:
+            single = read()
+    assert read() == single
+
+
+def test_create_article_barcode_taken_concurrently(
+    client: TestClient, db_session: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    user_data = create_random_user(db_session)
+    headers = get_user_authentication_headers(
+        client=client, email=user_data["email"], password=user_data["password"]
+    )
+    crud.article.create_with_owner(
+        db_session,
+        obj_in=ArticleCreate(name="First", price=1.0, barcodes=["race-1"]),
+        owner_id=user_data["user"].id,
+    )
+    get_by_barcode = crud.article.get_by_barcode
+    calls = []
+
+    def get_by_barcode_before_write(db: Session, *, code: str):
+        # the first check runs before the other request wrote the code
+        calls.append(code)
+        return None if len(calls) == 1 else get_by_barcode(db, code=code)
+
+    monkeypatch.setattr(crud.article, "get_by_barcode", get_by_barcode_before_write)
+    response = client.post(
+        f"{settings.API_V1_STR}/articles/",
+        headers=headers,
+        json={"name": "Second", "price": 2.0, "barcodes": ["race-1"]},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Barcode already in use: race-1"
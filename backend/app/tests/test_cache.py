@@ -0,0 +1,65 @@
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.db.cache import CacheSync, EntityCache
+from app.schemas.article import ArticleUpdate
+from app.tests.utils.article import create_random_article
+from app.tests.utils.user import create_random_user, get_user_authentication_headers
+
+
+def test_no_stale_read_after_write(client: TestClient, db_session: Session) -> None:
+    user_data = create_random_user(db_session)
+    user = user_data["user"]
+    article = create_random_article(db_session, owner_id=user.id)
+    headers = get_user_authentication_headers(
+        client=client, email=user_data["email"], password=user_data["password"]
+    )
+    url = f"{settings.API_V1_STR}/articles/{article.id}"
+    assert client.get(url, headers=headers).json()["price"] == 10.5
+    hits = crud.article.cache.hits
+    assert client.get(url, headers=headers).json()["price"] == 10.5
+    assert crud.article.cache.hits == hits + 1
+
+    response = client.put(url, headers=headers, json={"price": 11.5})
+    assert response.json()["price"] == 11.5
+    assert client.get(url, headers=headers).json()["price"] == 11.5
+
+    crud.article.update(db_session, db_obj=article, obj_in=ArticleUpdate(price=3.0))
+    db_session.expunge_all()
+    assert crud.article.get(db_session, article.id).price == 3.0
+
+    assert client.delete(url, headers=headers).status_code == 200
+    assert client.get(url, headers=headers).status_code == 404
+
+
+def test_entity_cache_eviction_and_generation() -> None:
+    cache = EntityCache(maxsize=2, ttl=60.0)
+    for key in (1, 2, 3):
+        cache.set(key, {"id": key}, cache.generation)
+    assert cache.get(1) is None
+    assert cache.get(3) == {"id": 3}
+    assert cache.stats() == {"size": 2, "hits": 1, "misses": 1, "evictions": 1}
+
+    generation = cache.generation
+    cache.invalidate(2)
+    cache.set(2, {"id": 2}, generation)
+    assert cache.get(2) is None
+
+
+def test_cache_sync_invalidates_other_workers_writes(db_session: Session) -> None:
+    user = create_random_user(db_session)["user"]
+    article = create_random_article(db_session, owner_id=user.id)
+    cache = EntityCache()
+    sync = CacheSync(interval=0.001)
+    sync.register("article", cache)
+    sync.poll(db_session)
+    cache.set(article.id, {"id": article.id}, cache.generation)
+
+    crud.article.update(db_session, db_obj=article, obj_in=ArticleUpdate(price=4.0))
+    time.sleep(0.002)
+    sync.poll(db_session)
+    assert cache.get(article.id) is None
@@ -0,0 +1,112 @@
+import asyncio
+from typing import List
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.routes import articles as articles_route
+from app.schemas.article import ArticleUpdate
+from app.schemas.event import Event
+from app.services.event_hub import EventHub, event_hub
+from app.tests.utils.article import create_random_article
+from app.tests.utils.user import create_random_user, get_user_authentication_headers
+
+
+def test_article_writes_are_published(db_session: Session) -> None:
+    user = create_random_user(db_session)["user"]
+
+    async def main() -> list:
+        subscriber = event_hub.subscribe(owner_id=user.id)
+        try:
+            article = create_random_article(db_session, owner_id=user.id)
+            crud.article.update(
+                db_session, db_obj=article, obj_in=ArticleUpdate(price=1.99)
+            )
+            crud.article.remove(db_session, id=article.id)
+            await asyncio.sleep(0)
+            return [subscriber.queue.get_nowait() for _ in range(3)]
+        finally:
+            event_hub.unsubscribe(subscriber)
+
+    created, updated, deleted = asyncio.run(main())
+    assert created.type == "article.created"
+    assert updated.type == "article.updated"
+    assert updated.data["price"] == 1.99
+    assert deleted.type == "article.deleted"
+    assert deleted.data is None
+    assert created.id < updated.id < deleted.id
+
+
+def test_slow_subscriber_is_dropped_and_replays() -> None:
+    hub = EventHub(buffer_size=4, queue_size=2)
+
+    async def main() -> None:
+        subscriber = hub.subscribe(owner_id=1)
+        hub.publish([Event(id=i, type="article.updated", owner_id=1) for i in (1, 2)])
+        hub.publish([Event(id=3, type="article.updated", owner_id=2)])
+        hub.publish([Event(id=4, type="article.updated", owner_id=1)])
+        await asyncio.sleep(0)
+        assert subscriber.dropped
+        assert subscriber.queue.get_nowait().id == 2
+        assert subscriber.queue.get_nowait() is None
+
+        assert [e.id for e in hub.replay(subscriber, 1)] == [2, 4]
+        hub.publish([Event(id=i, type="article.updated") for i in (5, 6)])
+        assert hub.replay(subscriber, 1) is None
+
+    asyncio.run(main())
+
+
+def test_stream_replays_after_last_event_id(
+    client: TestClient, db_session: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    user_data = create_random_user(db_session)
+    owner_id = user_data["user"].id
+    headers = get_user_authentication_headers(
+        client=client, email=user_data["email"], password=user_data["password"]
+    )
+    hub = EventHub(buffer_size=4)
+    subscribe = hub.subscribe
+
+    def subscribe_and_drop(**kwargs):
+        # end the stream after the replay, as for a client that fell behind
+        subscriber = subscribe(**kwargs)
+        subscriber.queue.put_nowait(None)
+        return subscriber
+
+    monkeypatch.setattr(hub, "subscribe", subscribe_and_drop)
+    monkeypatch.setattr(articles_route, "event_hub", hub)
+    hub.publish(
+        [
+            Event(id=1, type="article.created", owner_id=owner_id, supplier_id=7),
+            Event(id=2, type="article.created", owner_id=owner_id, supplier_id=7),
+            Event(id=3, type="article.created", owner_id=owner_id + 1),
+            Event(id=4, type="supplier.updated", supplier_id=7),
+            Event(id=5, type="article.updated", owner_id=owner_id, supplier_id=8),
+        ]
+    )
+
+    def stream(last_event_id: int, params: str = "") -> List[tuple]:
+        response = client.get(
+            f"{settings.API_V1_STR}/articles/events{params}",
+            headers={**headers, "Last-Event-ID": str(last_event_id)},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = []
+        for block in response.text.split("\n\n"):
+            fields = dict(
+                line.split(": ", 1) for line in block.splitlines() if ":" in line
+            )
+            if "id" in fields:
+                events.append((int(fields["id"]), fields["event"]))
+        return events
+
+    # only the user's own articles, the other owner and the supplier are skipped
+    assert stream(1) == [(2, "article.created"), (5, "article.updated")]
+    assert stream(1, "?supplier_id=7") == [(2, "article.created")]
+    # event 1 fell out of the buffer, the client has to catch up by the feed
+    assert stream(0) == [(0, "resync")]
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.models.article import Article
+from app.models.idempotency_key import IdempotencyKey
+from app.routes.idempotency import fingerprint
+from app.tests.utils.user import create_random_user, get_user_authentication_headers
+
+
+def test_idempotency_key(
+    client: TestClient, db_session: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    user_data = create_random_user(db_session)
+    user = user_data["user"]
+    headers = get_user_authentication_headers(
+        client=client, email=user_data["email"], password=user_data["password"]
+    )
+    url = f"{settings.API_V1_STR}/articles/"
+    data = {"name": "Milk", "price": 1.19}
+
+    first = client.post(url, headers={**headers, "Idempotency-Key": "a"}, json=data)
+    assert first.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+    retry = client.post(url, headers={**headers, "Idempotency-Key": "a"}, json=data)
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert db_session.query(Article).filter(Article.owner_id == user.id).count() == 1
+
+    # keys are per user
+    other_data = create_random_user(db_session)
+    other_headers = get_user_authentication_headers(
+        client=client, email=other_data["email"], password=other_data["password"]
+    )
+    response = client.post(
+        url, headers={**other_headers, "Idempotency-Key": "a"}, json=data
+    )
+    assert response.json()["id"] != first.json()["id"]
+
+    response = client.post(
+        url, headers={**headers, "Idempotency-Key": "a"}, json={"name": "Tea"}
+    )
+    assert response.status_code == 422
+
+    # a duplicate of a request still in flight waits for it, then gives up
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WAIT", 0.1)
+    body = b'{"name": "Milk", "price": 1.19}'
+    crud.idempotency_key.claim(
+        db_session,
+        user_id=user.id,
+        key="b",
+        fingerprint=fingerprint("POST", url, "", body),
+    )
+    response = client.post(
+        url,
+        headers={
+            **headers,
+            "Idempotency-Key": "b",
+            "Content-Type": "application/json",
+        },
+        content=body,
+    )
+    assert response.status_code == 409
+
+    db_obj = (
+        db_session.query(IdempotencyKey).filter_by(user_id=user.id, key="a").one()
+    )
+    db_obj.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    response = client.post(url, headers={**headers, "Idempotency-Key": "a"}, json=data)
+    assert "Idempotent-Replayed" not in response.headers
+    assert response.json()["id"] != first.json()["id"]
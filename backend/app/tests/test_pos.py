@@ -0,0 +1,84 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.schemas.article import ArticleCreate
+from app.services.barcode_index import barcode_index
+from app.tests.utils.user import create_random_user, get_user_authentication_headers
+
+
+def test_scan_barcode(client: TestClient, db_session: Session) -> None:
+    user_data = create_random_user(db_session)
+    headers = get_user_authentication_headers(
+        client=client, email=user_data["email"], password=user_data["password"]
+    )
+    data = {"name": "Milk", "price": 1.19, "barcodes": ["4006381333931", "12345"]}
+    response = client.post(
+        f"{settings.API_V1_STR}/articles/", headers=headers, json=data
+    )
+    assert response.status_code == 200
+    article = response.json()
+    assert article["barcodes"] == data["barcodes"]
+
+    response = client.get(f"{settings.API_V1_STR}/pos/scan/12345", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        "code": "12345",
+        "id": article["id"],
+        "name": "Milk",
+        "price": 1.19,
+    }
+
+    client.put(
+        f"{settings.API_V1_STR}/articles/{article['id']}",
+        headers=headers,
+        json={"price": 1.29, "barcodes": ["4006381333931"]},
+    )
+    response = client.get(
+        f"{settings.API_V1_STR}/pos/scan/4006381333931", headers=headers
+    )
+    assert response.json()["price"] == 1.29
+    response = client.get(f"{settings.API_V1_STR}/pos/scan/12345", headers=headers)
+    assert response.status_code == 404
+
+    response = client.post(
+        f"{settings.API_V1_STR}/articles/",
+        headers=headers,
+        json={"name": "Other", "price": 2.0, "barcodes": ["4006381333931"]},
+    )
+    assert response.status_code == 400
+
+    other_data = create_random_user(db_session)
+    other_headers = get_user_authentication_headers(
+        client=client, email=other_data["email"], password=other_data["password"]
+    )
+    response = client.get(
+        f"{settings.API_V1_STR}/pos/scan/4006381333931", headers=other_headers
+    )
+    assert response.status_code == 404
+
+
+def test_scan_keeps_writes_made_while_loading(
+    db_session: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    user = create_random_user(db_session)["user"]
+    article = crud.article.create_with_owner(
+        db_session,
+        obj_in=ArticleCreate(name="Tea", price=2.5, barcodes=["778899"]),
+        owner_id=user.id,
+    )
+    barcode_index.clear()
+    execute = db_session.execute
+
+    def execute_with_write(*args, **kwargs):
+        # a commit lands between the snapshot queries and the swap
+        monkeypatch.setattr(db_session, "execute", execute)
+        result = execute(*args, **kwargs)
+        barcode_index.put(article.id, ["778899"], (article.id, "Tea", 2.75, user.id))
+        return result
+
+    monkeypatch.setattr(db_session, "execute", execute_with_write)
+    entry = barcode_index.lookup(db_session, "778899")
+    assert entry == (article.id, "Tea", 2.75, user.id)
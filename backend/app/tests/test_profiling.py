@@ -0,0 +1,110 @@
+import sys
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+from pydantic.fields import ModelField
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.services.profiler import Sampler
+from app.tests.utils.user import create_random_user, get_user_authentication_headers
+
+
+def test_profile_request(
+    client: TestClient, db_session: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    user_data = create_random_user(db_session)
+    headers = get_user_authentication_headers(
+        client=client, email=user_data["email"], password=user_data["password"]
+    )
+    url = f"{settings.API_V1_STR}/articles/?limit=100"
+    get_multi = crud.article.get_multi
+
+    decode = jwt.decode
+    validate = ModelField.validate
+
+    def slow_get_multi(*args, **kwargs):
+        time.sleep(0.05)
+        return get_multi(*args, **kwargs)
+
+    def slow_decode(*args, **kwargs):
+        time.sleep(0.02)
+        return decode(*args, **kwargs)
+
+    def slow_validate(self, *args, **kwargs):
+        time.sleep(0.02)
+        return validate(self, *args, **kwargs)
+
+    monkeypatch.setattr(crud.article, "get_multi", slow_get_multi)
+
+    response = client.get(url, headers={**headers, "X-Profile": "1"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+
+    user_data["user"].is_superuser = True
+    db_session.commit()
+    monkeypatch.setattr(jwt, "decode", slow_decode)
+    monkeypatch.setattr(ModelField, "validate", slow_validate)
+    response = client.get(url, headers={**headers, "X-Profile": "1"})
+    monkeypatch.undo()
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    response = client.get(
+        f"{settings.API_V1_STR}/admin/profiles/{profile_id}",
+        headers=headers,
+        params={"format": "collapsed"},
+    )
+    assert response.status_code == 200
+    stacks = response.text.splitlines()
+    for frame in (
+        "read_articles (app/routes/articles.py",
+        "get_current_user (app/routes/deps.py",
+        "slow_validate (",
+    ):
+        assert any(line.startswith(f"worker thread;{frame}") for line in stacks)
+    assert not any("stop (app/services/profiler.py" in line for line in stacks)
+
+    response = client.get(
+        f"{settings.API_V1_STR}/admin/profiles/{profile_id}", headers=headers
+    )
+    profile = response.json()["profiles"][0]
+    assert profile["type"] == "sampled"
+    assert len(profile["samples"]) == len(stacks)
+
+    response = client.get(f"{settings.API_V1_STR}/admin/profiles", headers=headers)
+    assert response.json()[0]["path"] == "/api/v1/articles/?limit=100"
+
+
+def test_sampler_skips_other_requests_threads() -> None:
+    def profiled_lookup() -> None:
+        time.sleep(0.05)
+
+    def concurrent_lookup() -> None:
+        time.sleep(0.05)
+
+    def endpoint(lookup) -> None:
+        lookup()
+
+    sampler = Sampler(0.001, sys._getframe(), frozenset([endpoint.__code__]))
+
+    def run_profiled() -> None:
+        with sampler.thread():
+            endpoint(profiled_lookup)
+
+    threads = [
+        threading.Thread(target=run_profiled),
+        threading.Thread(target=endpoint, args=(concurrent_lookup,)),
+    ]
+    sampler.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stacks = sampler.stop()
+    assert "profiled_lookup" in stacks
+    assert "concurrent_lookup" not in stacks
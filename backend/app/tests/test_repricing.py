@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models.article import Article
+from app.schemas.article import ArticleCreate
+from app.schemas.repricing import RepricingOverride, RepricingRules
+from app.schemas.supplier import SupplierCreate
+from app.services.event_hub import event_hub
+from app.services.repricing_service import repricing_service
+from app.tests.utils.user import create_random_user
+
+
+def test_evaluate_rules() -> None:
+    rules = RepricingRules(
+        markup_percent=10,
+        min_margin=0.5,
+        price_ending=0.99,
+        overrides={2: RepricingOverride(markup_percent=50)},
+    )
+    prices = np.array([1.0, 10.0, 20.0, 9.0])
+    suppliers = np.array([1, 1, 1, 2])
+    new_prices = repricing_service.evaluate(rules, prices, suppliers)
+    # 1.0 + 0.5 -> 1.99, 10 * 1.1 = 11.0 -> 11.99, 22.0 -> 22.99, 9 * 1.5 -> 13.99
+    assert new_prices.tolist() == [1.99, 11.99, 22.99, 13.99]
+    rules = RepricingRules(price_ending=0.99)
+    assert repricing_service.evaluate(rules, np.array([10.99]), suppliers[:1]) == 10.99
+
+
+def test_preview_and_apply(db_session: Session) -> None:
+    user = create_random_user(db_session)["user"]
+    supplier = crud.supplier.create(db_session, obj_in=SupplierCreate(name="acme"))
+    other = crud.supplier.create(db_session, obj_in=SupplierCreate(name="other"))
+    articles = [
+        crud.article.create_with_owner(
+            db_session,
+            obj_in=ArticleCreate(name="a", price=price, supplier_id=supplier_id),
+            owner_id=user.id,
+        )
+        for price, supplier_id in (
+            (2.0, supplier.id),
+            (4.99, supplier.id),
+            (3.0, other.id),
+        )
+    ]
+    crud.article.get(db_session, articles[0].id)
+    rules = RepricingRules(
+        supplier_ids=[supplier.id], min_margin=1.0, price_ending=0.99
+    )
+
+    preview = repricing_service.preview(db_session, rules=rules)
+    assert preview.matched == 2
+    assert [(c.id, c.new_price) for c in preview.changes] == [
+        (articles[0].id, 3.99),
+        (articles[1].id, 5.99),
+    ]
+    assert crud.article.get(db_session, articles[0].id).price == 2.0
+
+    since = crud.change.get_since(db_session, owner_id=user.id)[-1].seq
+    result = repricing_service.apply(db_session, rules=rules)
+    assert result.changed == 2
+    assert crud.article.get(db_session, articles[0].id).price == 3.99
+    assert crud.article.get(db_session, articles[2].id).price == 3.0
+    changes = crud.change.get_since(db_session, since=since, owner_id=user.id)
+    assert sorted(c.entity_id for c in changes) == [articles[0].id, articles[1].id]
+
+
+def test_apply_skips_concurrent_price_changes(
+    db_session: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    user = create_random_user(db_session)["user"]
+    supplier = crud.supplier.create(db_session, obj_in=SupplierCreate(name="acme"))
+    articles = [
+        crud.article.create_with_owner(
+            db_session,
+            obj_in=ArticleCreate(
+                name="a", price=2.0, supplier_id=supplier.id, barcodes=[code]
+            ),
+            owner_id=user.id,
+        )
+        for code in ("rp-1", "rp-2")
+    ]
+    evaluate = repricing_service.evaluate
+
+    def evaluate_during_update(*args, **kwargs):
+        # a PUT /articles/{id} lands between reading and writing the prices
+        db_session.execute(
+            update(Article).where(Article.id == articles[1].id).values(price=2.5)
+        )
+        return evaluate(*args, **kwargs)
+
+    events = []
+    monkeypatch.setattr(repricing_service, "evaluate", evaluate_during_update)
+    monkeypatch.setattr(event_hub, "queue", lambda db, event: events.append(event))
+    rules = RepricingRules(supplier_ids=[supplier.id], min_margin=1.0)
+    result = repricing_service.apply(db_session, rules=rules)
+    assert result.changed == 1
+    assert result.conflicts == [articles[1].id]
+    assert [c.id for c in result.changes] == [articles[0].id]
+    db_session.expire_all()
+    assert crud.article.get(db_session, articles[0].id).price == 3.0
+    assert crud.article.get(db_session, articles[1].id).price == 2.5
+    assert [(e.data["id"], e.data["barcodes"]) for e in events] == [
+        (articles[0].id, ["rp-1"])
+    ]
+
+
+def test_rules_validated() -> None:
+    for rules in (
+        {"price_ending": 1.0},
+        {"price_ending": -0.01},
+        {"markup_percent": -10},
+        {"min_margin": -1},
+        {"overrides": {1: {"min_margin": -0.5}}},
+    ):
+        with pytest.raises(ValidationError):
+            RepricingRules(**rules)
@@ -0,0 +1,159 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.models.sale import SalePartition, sale_lines_table
+from app.schemas.supplier import SupplierCreate
+from app.tests.utils.article import create_random_article
+from app.tests.utils.user import create_random_user, get_user_authentication_headers
+
+
+def test_record_sale_and_reports(client: TestClient, db_session: Session) -> None:
+    user_data = create_random_user(db_session)
+    user = user_data["user"]
+    supplier = crud.supplier.create(db_session, obj_in=SupplierCreate(name="acme"))
+    first = create_random_article(db_session, owner_id=user.id)
+    crud.article.update(
+        db_session, db_obj=first, obj_in={"supplier_id": supplier.id}
+    )
+    second = create_random_article(db_session, owner_id=user.id)
+    headers = get_user_authentication_headers(
+        client=client, email=user_data["email"], password=user_data["password"]
+    )
+    sale = {
+        "lines": [
+            {"article_id": first.id, "quantity": 2},
+            {"article_id": second.id, "quantity": 1, "unit_price": 9.0},
+        ]
+    }
+    response = client.post(
+        f"{settings.API_V1_STR}/pos/sales", headers=headers, json=sale
+    )
+    assert response.status_code == 200
+    assert response.json()["total"] == 30.0
+
+    # a closed day, written directly so that it lands in yesterday's partition
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    crud.sale.record(
+        db_session,
+        sale_id="yesterday",
+        sold_at=yesterday,
+        lines=[
+            {
+                "owner_id": user.id,
+                "article_id": first.id,
+                "supplier_id": supplier.id,
+                "quantity": 3,
+                "unit_price": 10.5,
+                "amount": 31.5,
+            }
+        ],
+    )
+
+    today = datetime.utcnow().date()
+    params = f"start={yesterday.date()}&end={today}"
+    response = client.get(
+        f"{settings.API_V1_STR}/pos/reports/day?{params}", headers=headers
+    )
+    assert response.json()["rows"] == [
+        {"key": str(yesterday.date()), "revenue": 31.5, "quantity": 3},
+        {"key": str(today), "revenue": 30.0, "quantity": 3},
+    ]
+    response = client.get(
+        f"{settings.API_V1_STR}/pos/reports/article?{params}", headers=headers
+    )
+    assert response.json()["rows"] == [
+        {"key": first.id, "revenue": 52.5, "quantity": 5},
+        {"key": second.id, "revenue": 9.0, "quantity": 1},
+    ]
+    response = client.get(
+        f"{settings.API_V1_STR}/pos/reports/supplier?{params}", headers=headers
+    )
+    assert response.json()["rows"] == [
+        {"key": 0, "revenue": 9.0, "quantity": 1},
+        {"key": supplier.id, "revenue": 52.5, "quantity": 5},
+    ]
+
+    other = create_random_user(db_session)["user"]
+    foreign = create_random_article(db_session, owner_id=other.id)
+    sale = {"lines": [{"article_id": foreign.id}]}
+    response = client.post(
+        f"{settings.API_V1_STR}/pos/sales", headers=headers, json=sale
+    )
+    assert response.status_code == 400
+
+
+def test_archive_partition(db_session: Session, tmp_path) -> None:
+    user = create_random_user(db_session)["user"]
+    article = create_random_article(db_session, owner_id=user.id)
+    sold_at = datetime.utcnow() - timedelta(days=2)
+    line = {
+        "owner_id": user.id,
+        "article_id": article.id,
+        "supplier_id": None,
+        "quantity": 1,
+        "unit_price": 10.5,
+        "amount": 10.5,
+    }
+    crud.sale.record(db_session, sale_id="old", sold_at=sold_at, lines=[line])
+
+    path = crud.sale.archive(db_session, day=sold_at.date(), directory=str(tmp_path))
+    assert os.path.exists(path)
+    report = crud.sale.report(
+        db_session, group_by="day", start=sold_at.date(), end=sold_at.date()
+    )
+    assert report == [{"key": sold_at.date(), "revenue": 10.5, "quantity": 1}]
+    with pytest.raises(ValueError):
+        crud.sale.record(db_session, sale_id="late", sold_at=sold_at, lines=[line])
+    with pytest.raises(ValueError):
+        crud.sale.archive(
+            db_session, day=datetime.utcnow().date(), directory=str(tmp_path)
+        )
+
+
+def test_first_sales_of_a_day_recorded_concurrently(
+    db_session: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    user = create_random_user(db_session)["user"]
+    article = create_random_article(db_session, owner_id=user.id)
+    sold_at = datetime.utcnow() - timedelta(days=3)
+    line = {
+        "owner_id": user.id,
+        "article_id": article.id,
+        "supplier_id": None,
+        "quantity": 1,
+        "unit_price": 10.5,
+        "amount": 10.5,
+    }
+
+    def sale_lines_table_after_other_sale(name: str):
+        # another request records the day's first sale in the meantime
+        monkeypatch.undo()
+        db_session.execute(
+            SalePartition.__table__.insert(),
+            {"day": sold_at.date(), "table_name": name, "archived": False},
+        )
+        return sale_lines_table(name)
+
+    # app.crud.sale is shadowed by the CRUD object of the same name
+    monkeypatch.setattr(
+        sys.modules["app.crud.sale"],
+        "sale_lines_table",
+        sale_lines_table_after_other_sale,
+    )
+    crud.sale.record(db_session, sale_id="first", sold_at=sold_at, lines=[line])
+    crud.sale.record(db_session, sale_id="second", sold_at=sold_at, lines=[line])
+    report = crud.sale.report(
+        db_session,
+        group_by="day",
+        start=sold_at.date(),
+        end=sold_at.date(),
+        today=sold_at.date(),
+    )
+    assert report == [{"key": sold_at.date(), "revenue": 21.0, "quantity": 2}]
@@ -0,0 +1,215 @@
+from typing import Dict, Generator
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm.session import Session
+
+from app import crud
+from app.db.base import Base
+from app.db import rebalance
+from app.db.rebalance import move_owner
+from app.db.shards import ShardRouter
+from app.models.article import Article
+from app.models.user import User
+from app.schemas.article import ArticleCreate
+from app.schemas.supplier import SupplierCreate
+from app.tests.utils.article import create_random_article
+from app.tests.utils.user import create_random_user
+
+
+@pytest.fixture(scope="function")
+def engines(tmp_path) -> Dict[str, Engine]:
+    engines = {
+        name: create_engine(f"sqlite:///{tmp_path / name}.db")
+        for name in ("default", "shard_a", "shard_b")
+    }
+    for engine in engines.values():
+        Base.metadata.create_all(bind=engine)
+    return engines
+
+
+def make_router(engines: Dict[str, Engine]) -> ShardRouter:
+    shards = {name: engine for name, engine in engines.items() if name != "default"}
+    return ShardRouter(engines["default"], shards, refresh_interval=0)
+
+
+@pytest.fixture(scope="function")
+def router(engines: Dict[str, Engine]) -> ShardRouter:
+    return make_router(engines)
+
+
+@pytest.fixture(scope="function")
+def sharded_session(router: ShardRouter) -> Generator[Session, None, None]:
+    session = router.sessionmaker()()
+    yield session
+    session.close()
+
+
+def count_articles(router: ShardRouter, shard: str, owner_id: int) -> int:
+    with router.shard_engines[shard].connect() as conn:
+        return conn.execute(
+            select(func.count()).where(Article.owner_id == owner_id)
+        ).scalar()
+
+
+def test_articles_routed_by_owner(
+    router: ShardRouter, sharded_session: Session
+) -> None:
+    first = create_random_user(sharded_session)["user"]
+    second = create_random_user(sharded_session)["user"]
+    router.assign(first.id, "shard_a")
+    router.assign(second.id, "shard_b")
+    ids = [
+        create_random_article(sharded_session, owner_id=owner.id).id
+        for owner in (first, second, first, second, first)
+    ]
+    assert count_articles(router, "shard_a", first.id) == 3
+    assert count_articles(router, "shard_b", second.id) == 2
+
+    article = crud.article.get(sharded_session, ids[1])
+    assert article.owner.id == second.id
+    owned = crud.article.get_multi_by_owner(sharded_session, owner_id=first.id)
+    assert [a.id for a in owned] == [ids[0], ids[2], ids[4]]
+
+    page = crud.article.get_multi(sharded_session, skip=1, limit=3)
+    assert [a.id for a in page] == ids[1:4]
+
+    supplier = crud.supplier.create(sharded_session, obj_in=SupplierCreate(name="acme"))
+    for id in ids[1:]:
+        article = crud.article.get(sharded_session, id)
+        crud.article.update(
+            sharded_session, db_obj=article, obj_in={"supplier_id": supplier.id}
+        )
+    page = crud.article.get_multi(
+        sharded_session, supplier_id=supplier.id, skip=1, limit=2
+    )
+    assert [a.id for a in page] == ids[2:4]
+
+
+def test_move_owner(router: ShardRouter, sharded_session: Session) -> None:
+    owner = create_random_user(sharded_session)["user"]
+    router.assign(owner.id, "shard_a")
+    for _ in range(3):
+        create_random_article(sharded_session, owner_id=owner.id)
+
+    assert move_owner(router, owner.id, "shard_b") == 3
+    assert count_articles(router, "shard_a", owner.id) == 0
+    assert count_articles(router, "shard_b", owner.id) == 3
+
+    create_random_article(sharded_session, owner_id=owner.id)
+    assert count_articles(router, "shard_b", owner.id) == 4
+    owned = crud.article.get_multi_by_owner(sharded_session, owner_id=owner.id)
+    assert len(owned) == 4
+
+
+def test_move_owner_seen_by_other_router(
+    engines: Dict[str, Engine], router: ShardRouter, sharded_session: Session
+) -> None:
+    owner = create_random_user(sharded_session)["user"]
+    router.assign(owner.id, "shard_a")
+    create_random_article(sharded_session, owner_id=owner.id)
+    # another worker, which already routed the owner
+    worker = make_router(engines)
+    assert worker.shard_for(owner.id) == "shard_a"
+
+    move_owner(router, owner.id, "shard_b")
+    assert worker.shard_for(owner.id) == "shard_b"
+    worker_session = worker.sessionmaker()()
+    try:
+        create_random_article(worker_session, owner_id=owner.id)
+        owned = crud.article.get_multi_by_owner(worker_session, owner_id=owner.id)
+        assert len(owned) == 2
+    finally:
+        worker_session.close()
+    assert count_articles(router, "shard_b", owner.id) == 2
+
+
+def test_move_owner_drops_cached_articles(
+    router: ShardRouter, sharded_session: Session
+) -> None:
+    owner = create_random_user(sharded_session)["user"]
+    router.assign(owner.id, "shard_a")
+    article_id = create_random_article(sharded_session, owner_id=owner.id).id
+    crud.article.get(sharded_session, article_id)
+    cached = crud.article.cache.get(article_id)
+    assert cached[1] == "shard_a"
+    feed = crud.change.get_since(sharded_session, since=0)
+    since = feed[-1].seq
+
+    move_owner(router, owner.id, "shard_b")
+    assert crud.article.cache.get(article_id) is None
+    feed = crud.change.get_since(sharded_session, since=since)
+    assert [(c.entity, c.entity_id) for c in feed] == [("article", article_id)]
+
+    # a copy cached by a worker that hasn't seen the feed yet
+    crud.article.cache.set(article_id, cached, crud.article.cache.generation)
+    session = router.sessionmaker()()
+    try:
+        article = crud.article.get(session, article_id)
+        crud.article.update(session, db_obj=article, obj_in={"price": 3.5})
+    finally:
+        session.close()
+    with router.shard_engines["shard_b"].connect() as conn:
+        price = conn.execute(
+            select(Article.price).where(Article.id == article_id)
+        ).scalar()
+    assert price == 3.5
+
+
+def test_move_owner_carries_over_writes_during_switch(
+    router: ShardRouter, sharded_session: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    owner = create_random_user(sharded_session)["user"]
+    router.assign(owner.id, "shard_a")
+    ids = [
+        create_random_article(sharded_session, owner_id=owner.id).id
+        for _ in range(4)
+    ]
+    table = Article.__table__
+
+    def sleep(seconds: float) -> None:
+        # workers that haven't noticed the move yet write to shard_a
+        with router.shard_engines["shard_a"].begin() as conn:
+            conn.execute(
+                table.update().where(table.c.id == ids[0]).values(price=1.0)
+            )
+            conn.execute(table.delete().where(table.c.id == ids[1]))
+            conn.execute(
+                table.update().where(table.c.id == ids[2]).values(price=2.0)
+            )
+            conn.execute(
+                table.insert(),
+                {"id": 900001, "name": "Late", "price": 3.0, "owner_id": owner.id},
+            )
+        # one that has writes to shard_b, and wins
+        with router.shard_engines["shard_b"].begin() as conn:
+            conn.execute(
+                table.update().where(table.c.id == ids[2]).values(price=4.0)
+            )
+
+    monkeypatch.setattr(rebalance.time, "sleep", sleep)
+    assert move_owner(router, owner.id, "shard_b") == 4
+    assert count_articles(router, "shard_a", owner.id) == 0
+    with router.shard_engines["shard_b"].connect() as conn:
+        prices = dict(
+            conn.execute(
+                select(Article.id, Article.price).where(Article.owner_id == owner.id)
+            ).all()
+        )
+    assert prices == {ids[0]: 1.0, ids[2]: 4.0, ids[3]: 10.5, 900001: 3.0}
+
+
+def test_article_id_in_open_transaction(
+    router: ShardRouter, sharded_session: Session
+) -> None:
+    owner = create_random_user(sharded_session)["user"]
+    # the session holds the default database's write lock until it commits
+    sharded_session.add(User(email="pending@example.com", hashed_password="x"))
+    sharded_session.flush()
+    article = crud.article.create_with_owner(
+        sharded_session,
+        obj_in=ArticleCreate(name="Tea", price=1.0),
+        owner_id=owner.id,
+    )
+    assert crud.article.get(sharded_session, article.id).name == "Tea"
@@ -0,0 +1,92 @@
+import gzip
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import crud
+from app.core.config import settings
+from app.db.base import Base
+from app.models.article import Article
+from app.models.barcode import Barcode
+from app.schemas.article import ArticleCreate
+from app.services.snapshot_service import snapshot_service
+from app.tests.utils.user import create_random_user, get_user_authentication_headers
+
+
+def test_snapshot_and_restore(
+    client: TestClient, db_session: Session, tmp_path
+) -> None:
+    user_data = create_random_user(db_session)
+    user = user_data["user"]
+    user.is_superuser = True
+    db_session.commit()
+    for name in ("Milk", "Tea"):
+        crud.article.create_with_owner(
+            db_session,
+            obj_in=ArticleCreate(name=name, price=1.5, barcodes=[f"code-{name}"]),
+            owner_id=user.id,
+        )
+    headers = get_user_authentication_headers(
+        client=client, email=user_data["email"], password=user_data["password"]
+    )
+
+    response = client.get(f"{settings.API_V1_STR}/admin/snapshot", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "application/gzip"
+    assert response.headers["Content-Encoding"] == "identity"
+    snapshot = response.content
+    assert len(snapshot) == int(response.headers["Content-Length"])
+    seq = int(response.headers["X-Snapshot-Seq"])
+    assert seq == crud.change.get_since(db_session, since=0, limit=1000)[-1].seq
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'terminal.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        trailer = snapshot_service.restore(conn, io.BytesIO(snapshot))
+    assert trailer["seq"] == seq
+    assert trailer["sha256"] == response.headers["X-Snapshot-SHA256"]
+    with engine.connect() as conn:
+        names = conn.execute(
+            select(Article.name).where(Article.owner_id == user.id)
+        ).scalars()
+        assert sorted(names) == ["Milk", "Tea"]
+        barcodes = conn.execute(select(func.count(Barcode.id))).scalar()
+        assert barcodes == db_session.query(Barcode).count()
+
+    lines = gzip.decompress(snapshot).splitlines(keepends=True)
+    lines[-2] = lines[-2].replace(b"Milk", b"Mild")
+    tampered = b"".join(lines)
+    with pytest.raises(ValueError):
+        with engine.begin() as conn:
+            snapshot_service.restore(conn, io.BytesIO(gzip.compress(tampered)))
+    with engine.connect() as conn:
+        count = conn.execute(select(func.count(Article.id))).scalar()
+        assert count == trailer["rows"]["articles"]
+
+
+def test_snapshot_of_sqlite_backup(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'store.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(
+            Article.__table__.insert(),
+            [{"id": i, "name": f"article {i}", "price": 1.0} for i in range(1, 26)],
+        )
+    snapshot = io.BytesIO()
+    db = sessionmaker(bind=engine)()
+    try:
+        trailer = snapshot_service.write(db, snapshot)
+    finally:
+        db.close()
+    assert trailer["rows"]["articles"] == 25
+
+    terminal = create_engine(f"sqlite:///{tmp_path / 'terminal.db'}")
+    Base.metadata.create_all(bind=terminal)
+    snapshot.seek(0)
+    with terminal.begin() as conn:
+        snapshot_service.restore(conn, snapshot)
+    with terminal.connect() as conn:
+        assert conn.execute(select(func.count(Article.id))).scalar() == 25
@@ -0,0 +1,115 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.article import Article
+from app.services import suggest_index as suggest_index_module
+from app.services.suggest_index import SuggestIndex
+from app.tests.utils.user import create_random_user, get_user_authentication_headers
+
+
+def test_suggest_articles(client: TestClient, db_session: Session) -> None:
+    user_data = create_random_user(db_session)
+    headers = get_user_authentication_headers(
+        client=client, email=user_data["email"], password=user_data["password"]
+    )
+    url = f"{settings.API_V1_STR}/articles"
+    ids = {}
+    for name in ("Kakao", "Käse", "Kaffee", "Tee"):
+        response = client.post(
+            f"{url}/", headers=headers, json={"name": name, "price": 2.0}
+        )
+        ids[name] = response.json()["id"]
+
+    def suggest(prefix: str, headers: dict = headers) -> list:
+        response = client.get(
+            f"{url}/suggest", headers=headers, params={"prefix": prefix}
+        )
+        assert response.status_code == 200
+        return [suggestion["name"] for suggestion in response.json()]
+
+    assert suggest("KA") == ["Kaffee", "Kakao", "Käse"]
+    assert suggest("KÄS") == suggest("kas") == ["Käse"]
+
+    sale = {"lines": [{"article_id": ids["Kakao"], "quantity": 3}]}
+    client.post(f"{settings.API_V1_STR}/pos/sales", headers=headers, json=sale)
+    assert suggest("ka") == ["Kakao", "Kaffee", "Käse"]
+
+    client.put(f"{url}/{ids['Kaffee']}", headers=headers, json={"name": "Tee grün"})
+    client.delete(f"{url}/{ids['Käse']}", headers=headers)
+    assert suggest("ka") == ["Kakao"]
+    assert suggest("tee  g") == ["Tee grün"]
+
+    other_data = create_random_user(db_session)
+    other_headers = get_user_authentication_headers(
+        client=client, email=other_data["email"], password=other_data["password"]
+    )
+    assert suggest("ka", other_headers) == []
+
+
+def test_suggest_writes_of_other_workers(
+    db_session: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    owners = [create_random_user(db_session)["user"].id for _ in range(2)]
+    index = SuggestIndex()
+
+    def insert(id: int, owner_id: int, name: str) -> None:
+        # written by another worker, this one only sees the change feed
+        db_session.execute(
+            Article.__table__.insert(),
+            {"id": id, "name": name, "price": 1.0, "owner_id": owner_id},
+        )
+
+    insert(900001, owners[0], "Zimt")
+    insert(900002, owners[1], "Zitrone")
+    assert index.suggest(db_session, "zi") == [
+        (900001, "Zimt", 0.0),
+        (900002, "Zitrone", 0.0),
+    ]
+    assert index.suggest(db_session, "zi", owner_id=owners[0]) == [
+        (900001, "Zimt", 0.0)
+    ]
+
+    insert(900003, owners[0], "Zwiebel")
+    db_session.execute(
+        update(Article).where(Article.id == 900002).values(name="Limette")
+    )
+    index.invalidate_owned(900003, owners[0])
+    index.invalidate_owned(900002, owners[1])
+    assert [s[1] for s in index.suggest(db_session, "z")] == ["Zimt", "Zwiebel"]
+    assert [s[1] for s in index.suggest(db_session, "z", owner_id=owners[0])] == [
+        "Zimt",
+        "Zwiebel",
+    ]
+
+    # an owner loaded while one of its articles is written keeps the write
+    execute = db_session.execute
+
+    def execute_with_write(*args, **kwargs):
+        monkeypatch.setattr(db_session, "execute", execute)
+        result = execute(*args, **kwargs)
+        index.put(900004, owners[1], "Zucker")
+        return result
+
+    monkeypatch.setattr(db_session, "execute", execute_with_write)
+    assert index.suggest(db_session, "zu", owner_id=owners[1]) == [
+        (900004, "Zucker", 0.0)
+    ]
+
+    # and so does one written while its index is built
+    owner = create_random_user(db_session)["user"].id
+    insert(900005, owner, "Zimt")
+
+    class OwnerIndexWithWrite(suggest_index_module._OwnerIndex):
+        def __init__(self, *args, **kwargs) -> None:
+            super().__init__(*args, **kwargs)
+            monkeypatch.undo()
+            index.put(900006, owner, "Zucker")
+
+    monkeypatch.setattr(suggest_index_module, "_OwnerIndex", OwnerIndexWithWrite)
+    assert [s[1] for s in index.suggest(db_session, "z", owner_id=owner)] == [
+        "Zimt",
+        "Zucker",
+    ]
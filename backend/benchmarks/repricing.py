@@ -0,0 +1,93 @@
+"""
+Benchmark the repricing service on a generated catalog.
+
+    python -m benchmarks.repricing [articles]
+
+Runs against a temporary SQLite database, 1,000,000 articles by default.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.article import Article
+from app.models.supplier import Supplier
+from app.models.user import User
+from app.schemas.repricing import RepricingOverride, RepricingRules
+from app.services.repricing_service import repricing_service
+
+SUPPLIERS = 50
+
+
+def populate(engine, count: int) -> None:
+    random.seed(0)
+    with engine.begin() as conn:
+        conn.execute(
+            User.__table__.insert(),
+            [{"id": 1, "email": "bench@example.com", "hashed_password": "-"}],
+        )
+        conn.execute(
+            Supplier.__table__.insert(),
+            [{"id": i, "name": f"supplier {i}"} for i in range(1, SUPPLIERS + 1)],
+        )
+        for start in range(0, count, 100000):
+            conn.execute(
+                Article.__table__.insert(),
+                [
+                    {
+                        "name": f"article {i}",
+                        "price": round(random.uniform(0.5, 200.0), 2),
+                        "supplier_id": random.randint(1, SUPPLIERS),
+                        "owner_id": 1,
+                    }
+                    for i in range(start, min(start + 100000, count))
+                ],
+            )
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        started = time.perf_counter()
+        populate(engine, count)
+        print(f"populate {count} articles: {time.perf_counter() - started:.2f}s")
+
+        rules = RepricingRules(
+            markup_percent=4.5,
+            min_margin=0.1,
+            price_ending=0.99,
+            overrides={
+                1: RepricingOverride(markup_percent=8),
+                2: RepricingOverride(min_margin=0.5),
+            },
+        )
+        db = sessionmaker(bind=engine)()
+        started = time.perf_counter()
+        ids, prices, suppliers, _ = repricing_service._load(db, rules)
+        loaded = time.perf_counter()
+        repricing_service.evaluate(rules, prices, suppliers)
+        evaluated = time.perf_counter()
+        print(f"load columns: {loaded - started:.2f}s")
+        print(f"evaluate rules: {(evaluated - loaded) * 1000:.1f}ms")
+
+        started = time.perf_counter()
+        result = repricing_service.preview(db, rules=rules)
+        print(f"preview: {time.perf_counter() - started:.2f}s")
+        started = time.perf_counter()
+        result = repricing_service.apply(db, rules=rules)
+        print(
+            f"apply: {time.perf_counter() - started:.2f}s "
+            f"({result.changed} of {result.matched} prices changed)"
+        )
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark barcode scan latency for growing catalogs.
+
+    python -m benchmarks.scan [articles ...]
+
+Runs against temporary SQLite databases, by default with 10,000, 100,000 and
+1,000,000 articles of two barcodes each.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.article import Article
+from app.models.barcode import Barcode
+from app.services.barcode_index import BarcodeIndex
+
+SCANS = 100000
+
+
+def populate(engine, count: int) -> None:
+    with engine.begin() as conn:
+        for start in range(0, count, 100000):
+            stop = min(start + 100000, count)
+            conn.execute(
+                Article.__table__.insert(),
+                [
+                    {"id": i, "name": f"article {i}", "price": 1.99, "owner_id": 1}
+                    for i in range(start + 1, stop + 1)
+                ],
+            )
+            conn.execute(
+                Barcode.__table__.insert(),
+                [
+                    {"code": f"{i:013d}{suffix}", "article_id": i}
+                    for i in range(start + 1, stop + 1)
+                    for suffix in ("", "-2")
+                ],
+            )
+
+
+def measure(count: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        populate(engine, count)
+        db = sessionmaker(bind=engine)()
+        index = BarcodeIndex()
+        started = time.perf_counter()
+        index.load(db)
+        loaded = time.perf_counter() - started
+
+        codes = [f"{random.randint(1, count):013d}" for _ in range(SCANS)]
+        timings = []
+        for code in codes:
+            started = time.perf_counter_ns()
+            index.lookup(db, code)
+            timings.append(time.perf_counter_ns() - started)
+        timings.sort()
+        print(
+            f"{count:>9} articles: load {loaded:.2f}s, "
+            f"scan median {statistics.median(timings) / 1000:.2f}us, "
+            f"p99 {timings[int(len(timings) * 0.99)] / 1000:.2f}us"
+        )
+        db.close()
+
+
+def main() -> None:
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    for count in counts:
+        measure(count)
+
+
+if __name__ == "__main__":
+    main()
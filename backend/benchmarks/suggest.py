@@ -0,0 +1,96 @@
+"""
+Benchmark typeahead latency for growing catalogs.
+
+    python -m benchmarks.suggest [articles ...]
+
+Runs against temporary SQLite databases, by default with 10,000, 100,000 and
+1,000,000 articles of one owner named from a small vocabulary. Reports the
+first request per prefix, which scans its range, and repeated requests, which
+are answered from the memoized top suggestions.
+"""
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.article import Article
+from app.services.suggest_index import SuggestIndex
+
+WORDS = [
+    "".join(random.choices(string.ascii_lowercase, k=random.randint(3, 9)))
+    for _ in range(2000)
+]
+REQUESTS = 100000
+
+
+def populate(engine, count: int) -> None:
+    with engine.begin() as conn:
+        for start in range(0, count, 100000):
+            stop = min(start + 100000, count)
+            conn.execute(
+                Article.__table__.insert(),
+                [
+                    {
+                        "id": i,
+                        "name": " ".join(random.choices(WORDS, k=3)).title(),
+                        "price": 1.99,
+                        "owner_id": 1,
+                    }
+                    for i in range(start + 1, stop + 1)
+                ],
+            )
+
+
+def percentiles(timings: list) -> str:
+    timings.sort()
+    return (
+        f"median {statistics.median(timings) / 1000:.2f}us, "
+        f"p99 {timings[int(len(timings) * 0.99)] / 1000:.2f}us"
+    )
+
+
+def measure(count: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        populate(engine, count)
+        db = sessionmaker(bind=engine)()
+        index = SuggestIndex()
+        started = time.perf_counter()
+        index.suggest(db, "a", owner_id=1)
+        loaded = time.perf_counter() - started
+
+        # what a cashier types: one to four letters of a word
+        prefixes = [
+            random.choice(WORDS)[: random.randint(1, 4)] for _ in range(REQUESTS)
+        ]
+        first, repeated = [], []
+        seen = set()
+        for prefix in prefixes:
+            started = time.perf_counter_ns()
+            index.suggest(db, prefix, owner_id=1)
+            elapsed = time.perf_counter_ns() - started
+            (repeated if prefix in seen else first).append(elapsed)
+            seen.add(prefix)
+        print(
+            f"{count:>9} articles: load {loaded:.2f}s, "
+            f"first {percentiles(first)}, repeated {percentiles(repeated)}"
+        )
+        db.close()
+
+
+def main() -> None:
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    for count in counts:
+        measure(count)
+
+
+if __name__ == "__main__":
+    main()